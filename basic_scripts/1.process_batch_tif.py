@@ -2,12 +2,25 @@
 import os
 import sys
 import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # --- 1. 사용자 설정 부분 ---
 QGIS_INSTALL_PATH = 'C:/Program Files/QGIS 3.40.11'  # 예시 경로
 INPUT_FOLDER = 'data/생육데이터/2.화성_6차'
 OUTPUT_FOLDER = 'data/생육데이터/2.화성_6차_vis'
 OUTPUT_WIDTH_PX = 1200
+RENDER_ENGINE = 'numpy'  # 'numpy': QGIS 없이 NumPy/rasterio/Pillow로 렌더링 (Linux 등 어디서나), 'qgis': 기존 QGIS 렌더러
+NUM_WORKERS = os.cpu_count() or 1  # 'numpy' 엔진의 병렬 처리 프로세스 수 (1이면 순차 처리, 'qgis'는 항상 순차)
+SAVE_CLASS_STATISTICS = True  # 등급별 픽셀 수/최소/최대를 출력하고 PNG 옆에 CSV로 저장
+CLASS_STATS_MEMORY_MB = 64  # 등급 통계 계산 시 한 번에 읽는 최대 메모리 (파일 크기와 무관)
+BUILD_OVERVIEWS = True  # 출력보다 큰 래스터에 오버뷰가 없으면 외부 .ovr로 생성 (원본 TIF는 그대로, 다음 실행부터 축소 읽기)
+RGB_MAX_WIDTH_PX = None  # RGB 미리보기 최대 가로 크기 (None이면 기존처럼 원본 크기)
+CLASSIFICATION_RULES_FILE = None  # 4.compute_class_breaks.py가 만든 규칙집(JSON) 경로. 지정하면 아래 CLASSIFICATION_MAP의 같은 지수를 대체
+EXPORT_XYZ_TILES = False  # 등급 분류 지수 래스터를 웹 지도용 XYZ 타일(Web Mercator, {z}/{x}/{y}.png)로도 내보내기
+TILE_OUTPUT_FOLDER = 'data/생육데이터/2.화성_6차_tiles'  # 레이어별 하위 폴더 + 전체 목록 layers.json
+TILE_SIZE = 256  # 타일 한 변의 픽셀 수
+TILE_MIN_ZOOM = None  # 최소 줌 (None이면 래스터 전체가 타일 1장에 들어가는 줌부터)
+TILE_BATCH_SIZE = 64  # 프로세스 하나가 한 번에 만드는 타일 수
 # -------------------------
 
 # --- 식생 지수별 등급/색상/라벨 규칙집 ---
@@ -114,51 +127,125 @@ def setup_qgis_environment():
     print("QGIS 환경 설정 완료.")
 
 
-def print_class_statistics(provider, rules):
-    """래스터 데이터의 각 등급별 최소/최대/픽셀 수를 계산하고 출력하는 함수"""
-    print("   [분석] 각 등급별 통계 계산 시작...")
-
-    extent = provider.extent()
-    width = provider.xSize()
-    height = provider.ySize()
-
-    class_pixels = {rule[2]: [] for rule in rules}
-    block = provider.block(1, extent, width, height)
-
-    # --- ★★★ 로직이 수정된 부분 ★★★ ---
-    # 5개의 등급 구간 경계값을 미리 변수로 지정합니다.
-    breaks = [r[0] for r in rules if isinstance(r[0], (int, float))]
-
-    # 모든 픽셀을 하나씩 확인하며 if/elif/else로 명확하게 분류
-    for i in range(width * height):
-        value = block.value(i)
-
-        if value <= breaks[0]:
-            class_pixels[rules[0][2]].append(value)
-        elif value <= breaks[1]:
-            class_pixels[rules[1][2]].append(value)
-        elif value <= breaks[2]:
-            class_pixels[rules[2][2]].append(value)
-        elif value <= breaks[3]:
-            class_pixels[rules[3][2]].append(value)
-        else:  # 나머지 모든 값 (마지막 등급)
-            class_pixels[rules[4][2]].append(value)
-
-    # 분류된 픽셀들의 통계 출력
+def compute_class_statistics(input_path, rules):
+    """
+    래스터 전체(원본 해상도)의 등급별 픽셀 수/최소/최대를 계산하는 함수
+    - 행 묶음 단위로 읽어(메모리 CLASS_STATS_MEMORY_MB 이내) np.digitize로 등급을 매기고 묶음별 결과를 누적
+    - 등급 기준은 렌더링과 동일 (classify_array: 경계값 이상 ~ 다음 경계값 미만)
+    - 반환: 규칙 순서대로 {'label', 'color', 'lower', 'upper', 'count', 'min', 'max'} 목록
+    """
+    import numpy as np
+    import rasterio
+    from rasterio.windows import Window
+
+    boundaries, _ = build_class_lookup(rules)
+    n_classes = len(rules)
+    counts = np.zeros(n_classes + 1, dtype='int64')
+    mins = np.full(n_classes + 1, np.inf)
+    maxs = np.full(n_classes + 1, -np.inf)
+
+    with rasterio.open(input_path) as src:
+        block_rows = src.block_shapes[0][0]
+        rows_per_chunk = max(1, int(CLASS_STATS_MEMORY_MB * 1024 * 1024 // (src.width * 8 * 3)))
+        rows_per_chunk = max(block_rows, rows_per_chunk // block_rows * block_rows)
+
+        for row_off in range(0, src.height, rows_per_chunk):
+            window = Window(0, row_off, src.width, min(rows_per_chunk, src.height - row_off))
+            data = src.read(1, window=window, masked=True)
+            values = data.data.astype('float64').ravel()
+            valid = ~np.ma.getmaskarray(data).ravel() & np.isfinite(values)
+
+            classes = classify_array(values, valid, boundaries)
+            chunk_counts = np.bincount(classes, minlength=n_classes + 1)
+            counts += chunk_counts
+            for k in np.flatnonzero(chunk_counts[1:]) + 1:
+                class_values = values[classes == k]
+                mins[k] = min(mins[k], class_values.min())
+                maxs[k] = max(maxs[k], class_values.max())
+
+    stats = []
+    edges = [-np.inf] + list(boundaries) + [np.inf]
+    for k, (_, color, label) in enumerate(rules, start=1):
+        stats.append({
+            'label': label, 'color': color, 'lower': edges[k - 1], 'upper': edges[k],
+            'count': int(counts[k]),
+            'min': mins[k] if counts[k] else None,
+            'max': maxs[k] if counts[k] else None,
+        })
+    return stats
+
+
+def print_class_statistics(stats):
+    """등급별 통계 표를 출력하는 함수"""
     print("   -------------------------------------------------")
     print("   | 범례 라벨         |  픽셀 수 |   최소값   |   최대값   |")
     print("   -------------------------------------------------")
-    for label, pixels in class_pixels.items():
-        count = len(pixels)
+    for row in stats:
+        label, count = row['label'], row['count']
         if count > 0:
-            min_val = min(pixels)
-            max_val = max(pixels)
-            print(f"   | {label:<18}| {count:>8} | {min_val:>10.4f} | {max_val:>10.4f} |")
+            print(f"   | {label:<18}| {count:>8} | {row['min']:>10.4f} | {row['max']:>10.4f} |")
         else:
             # nan 대신 '-'를 출력하여 더 깔끔하게 보여줍니다.
             print(f"   | {label:<18}| {count:>8} |      -     |      -     |")
     print("   -------------------------------------------------")
 
+
+def save_class_statistics(input_path, output_path, rules):
+    """등급별 통계를 계산해 출력하고, PNG 옆에 CSV({파일명}_class_stats.csv)로 저장하는 함수"""
+    import csv
+
+    print("   [분석] 각 등급별 통계 계산 시작...")
+    stats = compute_class_statistics(input_path, rules)
+    print_class_statistics(stats)
+
+    total = sum(row['count'] for row in stats)
+    csv_path = os.path.splitext(output_path)[0] + '_class_stats.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['label', 'color', 'lower', 'upper', 'pixel_count', 'ratio(%)', 'min', 'max'])
+        for row in stats:
+            writer.writerow([
+                row['label'], row['color'], row['lower'], row['upper'], row['count'],
+                round(row['count'] / total * 100, 2) if total else 0,
+                '' if row['min'] is None else row['min'],
+                '' if row['max'] is None else row['max'],
+            ])
+    print(f"   [성공] 등급별 통계 저장 완료: {os.path.basename(csv_path)}")
+
+
+def ensure_overviews(input_path, target_width, resampling='nearest'):
+    """
+    출력 크기보다 2배 이상 큰 래스터에 오버뷰가 없으면 만들어, 미리보기가 필요한 해상도만 읽도록 하는 함수
+    - TIFF_USE_OVR: 오버뷰를 외부 .ovr 파일로 저장하므로 원본 TIF는 내용/수정시각 모두 바뀌지 않음
+    - rasterio가 없거나(QGIS 환경) 폴더에 쓸 수 없으면 건너뜀 (전체 해상도에서 축소하여 읽음)
+    """
+    if not BUILD_OVERVIEWS or not target_width:
+        return
+    try:
+        import rasterio
+        from rasterio.enums import Resampling
+    except ImportError:
+        return
+
+    with rasterio.open(input_path) as src:
+        if src.overviews(1) or src.width < target_width * 2:
+            return
+        # 가장 작은 오버뷰도 출력 크기 이상이 되도록 2, 4, 8, ... 배율 선택
+        factors = []
+        factor = 2
+        while src.width / factor >= target_width:
+            factors.append(factor)
+            factor *= 2
+
+    try:
+        with rasterio.Env(TIFF_USE_OVR=True, COMPRESS_OVERVIEW='DEFLATE'):
+            with rasterio.open(input_path, 'r+') as dst:
+                dst.build_overviews(factors, getattr(Resampling, resampling))
+        print(f"   [오버뷰] 축소 배율 {factors} 생성 (.ovr)")
+    except Exception as e:
+        print(f"   [경고] 오버뷰를 만들 수 없어 원본 해상도에서 읽습니다: {e}")
+
+
 def process_raster(input_path, output_path, rules):
     """단일 GeoTIFF 파일을 처리하여 PNG로 저장하는 함수"""
     from qgis.core import (QgsProject, QgsRasterLayer, QgsSingleBandPseudoColorRenderer,
@@ -168,6 +255,7 @@ def process_raster(input_path, output_path, rules):
     from PyQt5.QtGui import QColor, QImage
 
     print(f"-> 처리 시작: {os.path.basename(input_path)}")
+    ensure_overviews(input_path, OUTPUT_WIDTH_PX)
     project = QgsProject.instance()
 
     raster_layer = QgsRasterLayer(input_path, os.path.basename(input_path))
@@ -179,7 +267,11 @@ def process_raster(input_path, output_path, rules):
     project.addMapLayer(raster_layer)
 
     provider = raster_layer.dataProvider()
-    # print_class_statistics(provider, rules)
+    if SAVE_CLASS_STATISTICS:
+        try:
+            save_class_statistics(input_path, output_path, rules)
+        except ImportError:
+            print("   [경고] rasterio/numpy가 없는 QGIS 환경이라 등급별 통계를 건너뜁니다.")
     stats = provider.bandStatistics(1)
     max_value = stats.maximumValue
 
@@ -257,6 +349,9 @@ def convert_rgb_to_png(input_path, output_path):
     extent = raster_layer.extent()
     width = raster_layer.width()
     height = raster_layer.height()
+    if RGB_MAX_WIDTH_PX and width > RGB_MAX_WIDTH_PX:
+        height = max(1, int(height * RGB_MAX_WIDTH_PX / width))
+        width = RGB_MAX_WIDTH_PX
 
     settings = QgsMapSettings()
     settings.setLayers([raster_layer])
@@ -274,14 +369,358 @@ def convert_rgb_to_png(input_path, output_path):
     print(f"   [성공] PNG 파일 저장 완료: {os.path.basename(output_path)}")
     project.removeMapLayer(raster_layer.id())
 
+# === NumPy 렌더링 엔진 (RENDER_ENGINE = 'numpy') ===
+def load_classification_rules(rules_file=None):
+    """
+    CLASSIFICATION_MAP에 규칙집 파일(4.compute_class_breaks.py 출력)의 지수별 규칙을 덮어쓴 규칙집을 반환
+    파일 형식: {'rules': {'NDVI': [[경계값, 색상, 라벨], ..., ['max', 색상, 라벨]], ...}, ...}
+    """
+    import json
+
+    rules_file = rules_file or CLASSIFICATION_RULES_FILE
+    classification_map = dict(CLASSIFICATION_MAP)
+    if not rules_file:
+        return classification_map
+
+    with open(rules_file, encoding='utf-8') as f:
+        loaded = json.load(f)
+    for index_name, rules in loaded['rules'].items():
+        classification_map[index_name.upper()] = [tuple(rule) for rule in rules]
+    print(f"규칙집 파일 적용: {rules_file} ({loaded.get('method', '?')}, {', '.join(loaded['rules'])})")
+    return classification_map
+
+
+def build_class_lookup(rules):
+    """규칙집을 (등급 경계값 배열, PNG 팔레트)로 변환. 팔레트 0번은 NoData(투명), i+1번은 i번째 등급 색상"""
+    import numpy as np
+
+    boundaries = np.array([value for value, _, _ in rules if value != 'max'], dtype='float64')
+    palette = [0, 0, 0]
+    for _, color, _ in rules:
+        palette += [int(color[k:k + 2], 16) for k in (1, 3, 5)]
+    return boundaries, palette
+
+
+def classify_array(values, valid, boundaries):
+    """
+    픽셀값을 등급 번호(1부터)로 변환하고 무효 픽셀은 0으로 표시
+    np.digitize(right=False): 경계값 이상 ~ 다음 경계값 미만이 한 등급 (규칙집 주석의 '이상 ~ 미만'과 동일)
+    """
+    import numpy as np
+
+    classes = np.digitize(values, boundaries, right=False).astype('uint8') + 1
+    classes[~valid] = 0
+    return classes
+
+
+def render_classified_png(input_path, output_path, rules):
+    """단일 GeoTIFF 파일을 규칙집 색상으로 분류하여 팔레트 PNG로 저장 (QGIS 불필요, 프로세스 풀에서 호출됨)"""
+    import numpy as np
+    import rasterio
+    from rasterio.enums import Resampling
+    from PIL import Image
+
+    print(f"-> 처리 시작: {os.path.basename(input_path)}")
+    ensure_overviews(input_path, OUTPUT_WIDTH_PX)
+    with rasterio.open(input_path) as src:
+        # 출력 크기로 바로 읽기 (오버뷰가 있으면 GDAL이 출력 해상도에 맞는 단계만 읽음)
+        # QGIS 렌더링과 같은 크기: 가로 OUTPUT_WIDTH_PX, 세로는 범위 비율대로 (Nearest 리샘플링)
+        bounds = src.bounds
+        output_height = max(1, int(OUTPUT_WIDTH_PX * (bounds.top - bounds.bottom) / (bounds.right - bounds.left)))
+        data = src.read(1, out_shape=(output_height, OUTPUT_WIDTH_PX),
+                        resampling=Resampling.nearest, masked=True)
+
+    values = data.data.astype('float64')
+    valid = ~np.ma.getmaskarray(data) & np.isfinite(values)
+    boundaries, palette = build_class_lookup(rules)
+
+    image = Image.fromarray(classify_array(values, valid, boundaries))
+    image.putpalette(palette)
+    image.save(output_path, transparency=0)
+    print(f"   [성공] PNG 파일 저장 완료: {os.path.basename(output_path)}")
+
+    if SAVE_CLASS_STATISTICS:
+        save_class_statistics(input_path, output_path, rules)
+
+
+def render_rgb_png(input_path, output_path):
+    """RGB GeoTIFF 파일을 PNG로 변환하여 저장 (QGIS 불필요, NoData/알파 밴드는 투명 처리)"""
+    import numpy as np
+    import rasterio
+    from rasterio.enums import Resampling
+    from PIL import Image
+
+    print(f"-> 처리 시작 (RGB 변환): {os.path.basename(input_path)}")
+    ensure_overviews(input_path, RGB_MAX_WIDTH_PX, 'average')
+    with rasterio.open(input_path) as src:
+        if src.count < 3:
+            print(f"   [경고] '{os.path.basename(input_path)}'은 RGB 파일이 아닌 것 같습니다(밴드 수 < 3). 건너뜁니다.")
+            return
+        # RGB_MAX_WIDTH_PX보다 크면 그 크기로 축소하여 읽기 (평균 리샘플링)
+        out_shape = (src.height, src.width)
+        if RGB_MAX_WIDTH_PX and src.width > RGB_MAX_WIDTH_PX:
+            out_shape = (max(1, int(src.height * RGB_MAX_WIDTH_PX / src.width)), RGB_MAX_WIDTH_PX)
+        rgb = src.read([1, 2, 3], out_shape=(3,) + out_shape, resampling=Resampling.average)
+        alpha = src.dataset_mask(out_shape=out_shape)
+
+    if rgb.dtype != np.uint8:
+        # 8비트가 아니면 QGIS 기본값과 같이 밴드별 누적 2~98% 범위를 0~255로 늘림
+        stretched = np.zeros(rgb.shape, dtype='uint8')
+        for band in range(3):
+            valid_values = rgb[band][alpha > 0]
+            if valid_values.size == 0:
+                continue
+            low, high = np.percentile(valid_values, [2, 98])
+            scale = 255.0 / (high - low) if high > low else 0.0
+            stretched[band] = np.clip((rgb[band] - low) * scale, 0, 255).astype('uint8')
+        rgb = stretched
+
+    image = Image.fromarray(np.dstack([rgb[0], rgb[1], rgb[2], alpha]), mode='RGBA')
+    image.save(output_path)
+    print(f"   [성공] PNG 파일 저장 완료: {os.path.basename(output_path)}")
+
+
+def run_render_tasks(tasks):
+    """파일별 렌더링 작업 실행: 'numpy' 엔진은 프로세스 풀에서 병렬, 'qgis' 엔진은 순차"""
+    if RENDER_ENGINE == 'qgis' or NUM_WORKERS <= 1:
+        for func, args in tasks:
+            func(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        futures = {executor.submit(func, *args): args[0] for func, args in tasks}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"   [오류] {os.path.basename(futures[future])}: {e}")
+
+# === XYZ 타일 내보내기 (EXPORT_XYZ_TILES = True) ===
+WEB_MERCATOR_HALF = 20037508.342789244  # EPSG:3857 세계 범위의 절반 (m)
+
+
+def tile_span(zoom):
+    """줌 단계의 타일 한 장이 덮는 Web Mercator 길이(m)"""
+    return 2 * WEB_MERCATOR_HALF / 2 ** zoom
+
+
+def tile_range(bounds, zoom):
+    """Web Mercator 범위(left, bottom, right, top)와 겹치는 타일 번호 범위 (x0, x1, y0, y1, 양끝 포함)"""
+    import math
+
+    span = tile_span(zoom)
+    last = 2 ** zoom - 1
+    left, bottom, right, top = bounds
+    x0 = min(last, max(0, math.floor((left + WEB_MERCATOR_HALF) / span)))
+    x1 = min(last, max(0, math.ceil((right + WEB_MERCATOR_HALF) / span) - 1))
+    y0 = min(last, max(0, math.floor((WEB_MERCATOR_HALF - top) / span)))
+    y1 = min(last, max(0, math.ceil((WEB_MERCATOR_HALF - bottom) / span) - 1))
+    return x0, x1, y0, y1
+
+
+def plan_tile_pyramid(input_path):
+    """
+    래스터의 Web Mercator 범위와 원본 해상도로 만들 줌 범위를 정하는 함수
+    - 최대 줌: 타일 픽셀 크기가 원본 픽셀 크기(재투영 기준)에 가장 가까운 줌 (그 이상은 확대만 되므로 만들지 않음)
+    - 최소 줌: TILE_MIN_ZOOM, 없으면 래스터 전체가 타일 1장에 들어가는 줌
+    """
+    import math
+    import rasterio
+    from rasterio.warp import calculate_default_transform, transform_bounds
+
+    with rasterio.open(input_path) as src:
+        transform, _, _ = calculate_default_transform(src.crs, 'EPSG:3857', src.width, src.height, *src.bounds)
+        bounds = transform_bounds(src.crs, 'EPSG:3857', *src.bounds)
+        lonlat_bounds = transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+
+    native_res = abs(transform.a)
+    max_zoom = max(0, round(math.log2(2 * WEB_MERCATOR_HALF / (TILE_SIZE * native_res))))
+    extent = max(bounds[2] - bounds[0], bounds[3] - bounds[1])
+    min_zoom = TILE_MIN_ZOOM
+    if min_zoom is None:
+        min_zoom = max(0, math.floor(math.log2(2 * WEB_MERCATOR_HALF / extent)))
+    min_zoom = min(min_zoom, max_zoom)
+
+    return {'bounds': bounds, 'lonlat_bounds': lonlat_bounds, 'native_res': native_res,
+            'min_zoom': min_zoom, 'max_zoom': max_zoom}
+
+
+def overview_level_for_zoom(factors, native_res, zoom):
+    """
+    줌 단계의 타일 픽셀 크기에 맞는 오버뷰 단계(rasterio.open의 overview_level)를 고르는 함수
+    - 축소 배율이 '타일 픽셀 크기 / 원본 픽셀 크기'를 넘지 않는 가장 큰 오버뷰 (타일보다 거친 단계는 쓰지 않음)
+    - 알맞은 오버뷰가 없으면 None (원본 해상도에서 읽음)
+    """
+    ratio = tile_span(zoom) / TILE_SIZE / native_res
+    level = None
+    for k, factor in enumerate(factors):
+        if factor <= ratio:
+            level = k
+    return level
+
+
+def tile_fingerprint(input_path, rules):
+    """원본 파일(크기/수정시각)과 규칙집, 타일 크기로 만든 지문. 같으면 기존 타일을 그대로 사용"""
+    import hashlib
+    import json
+
+    stat = os.stat(input_path)
+    key = json.dumps([os.path.basename(input_path), stat.st_size, stat.st_mtime_ns, rules, TILE_SIZE, TILE_MIN_ZOOM])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def render_tile_batch(input_path, rules, layer_dir, native_res, tiles):
+    """
+    타일 묶음을 등급 분류 팔레트 PNG({z}/{x}/{y}.png)로 저장 (프로세스 풀에서 호출됨)
+    - 줌 단계마다 타일 해상도에 맞는 오버뷰(overview_level_for_zoom)를 열어, 낮은 줌에서도 원본 전체를 읽지 않음
+    - 타일마다 WarpedVRT로 그 오버뷰를 타일 격자에 바로 재투영해 읽음 (Nearest)
+    - 유효 픽셀이 하나도 없는 타일은 만들지 않음 (지도에서는 빈 칸)
+    - 반환: 저장한 타일 수
+    """
+    import numpy as np
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_bounds
+    from rasterio.vrt import WarpedVRT
+    from PIL import Image
+
+    boundaries, palette = build_class_lookup(rules)
+    with rasterio.open(input_path) as src:
+        factors = src.overviews(1)
+        # NoData가 없는 실수형 래스터는 범위 밖을 NaN으로 채워 무효 처리
+        nodata = src.nodata
+        if nodata is None and np.issubdtype(np.dtype(src.dtypes[0]), np.floating):
+            nodata = np.nan
+
+    tiles_by_zoom = {}
+    for zoom, x, y in tiles:
+        tiles_by_zoom.setdefault(zoom, []).append((x, y))
+
+    written = 0
+    for zoom, coords in tiles_by_zoom.items():
+        level = overview_level_for_zoom(factors, native_res, zoom)
+        open_options = {} if level is None else {'overview_level': level}
+        span = tile_span(zoom)
+        with rasterio.open(input_path, **open_options) as src:
+            for x, y in coords:
+                left = -WEB_MERCATOR_HALF + x * span
+                top = WEB_MERCATOR_HALF - y * span
+                tile_transform = from_bounds(left, top - span, left + span, top, TILE_SIZE, TILE_SIZE)
+                with WarpedVRT(src, crs='EPSG:3857', transform=tile_transform, width=TILE_SIZE, height=TILE_SIZE,
+                               nodata=nodata, resampling=Resampling.nearest) as vrt:
+                    data = vrt.read(1, masked=True)
+
+                values = data.data.astype('float64')
+                valid = ~np.ma.getmaskarray(data) & np.isfinite(values)
+                if not valid.any():
+                    continue
+
+                tile_path = os.path.join(layer_dir, str(zoom), str(x), f"{y}.png")
+                os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+                image = Image.fromarray(classify_array(values, valid, boundaries))
+                image.putpalette(palette)
+                image.save(tile_path, transparency=0)
+                written += 1
+    return written
+
+
+def write_layers_index(tile_root):
+    """TILE_OUTPUT_FOLDER 아래 모든 레이어의 tiles.json을 모아 웹 대시보드용 목록(layers.json)을 저장"""
+    import json
+
+    layers = []
+    for meta_path in sorted(glob.glob(os.path.join(tile_root, '*', 'tiles.json'))):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        meta.pop('fingerprint', None)
+        layers.append(meta)
+
+    with open(os.path.join(tile_root, 'layers.json'), 'w', encoding='utf-8') as f:
+        json.dump({'tile_size': TILE_SIZE, 'layers': layers}, f, ensure_ascii=False, indent=2)
+    print(f"   [성공] 타일 레이어 목록 저장 완료: layers.json ({len(layers)}개 레이어)")
+
+
+def export_xyz_tiles(tile_layers):
+    """
+    등급 분류 지수 래스터들을 XYZ 타일 피라미드로 내보내는 함수
+    - tile_layers: (원본 경로, 레이어 이름, 지수 이름, 규칙집) 목록
+    - 지문(tile_fingerprint)이 이전 실행과 같은 레이어는 건너뛰고, 바뀌었거나 tiles.json이 없는 레이어
+      (중간에 멈춘 실행 포함)는 폴더를 비운 뒤 다시 생성
+    - 모든 레이어의 타일을 TILE_BATCH_SIZE개씩 묶어 NUM_WORKERS 프로세스로 병렬 생성
+    """
+    import json
+    import shutil
+
+    print(f"\n[XYZ 타일] {len(tile_layers)}개 레이어 확인 -> {TILE_OUTPUT_FOLDER}")
+    os.makedirs(TILE_OUTPUT_FOLDER, exist_ok=True)
+
+    jobs = []
+    pending = []
+    for input_path, layer_name, index_name, rules in tile_layers:
+        layer_dir = os.path.join(TILE_OUTPUT_FOLDER, layer_name)
+        meta_path = os.path.join(layer_dir, 'tiles.json')
+        fingerprint = tile_fingerprint(input_path, rules)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                if json.load(f).get('fingerprint') == fingerprint:
+                    print(f"-> '{layer_name}' 원본이 바뀌지 않아 타일 생성을 건너뜁니다.")
+                    continue
+        if os.path.isdir(layer_dir):
+            shutil.rmtree(layer_dir)
+
+        plan = plan_tile_pyramid(input_path)
+        tiles = []
+        for zoom in range(plan['min_zoom'], plan['max_zoom'] + 1):
+            x0, x1, y0, y1 = tile_range(plan['bounds'], zoom)
+            tiles += [(zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+        print(f"-> '{layer_name}' 줌 {plan['min_zoom']}~{plan['max_zoom']}, 타일 후보 {len(tiles)}개")
+
+        # 낮은 줌 타일이 원본 전체를 읽지 않도록 가장 작은 타일 피라미드 크기까지 오버뷰 준비
+        ensure_overviews(input_path, TILE_SIZE)
+        os.makedirs(layer_dir, exist_ok=True)
+        for start in range(0, len(tiles), TILE_BATCH_SIZE):
+            jobs.append((input_path, rules, layer_dir, plan['native_res'], tiles[start:start + TILE_BATCH_SIZE]))
+
+        west, south, east, north = plan['lonlat_bounds']
+        pending.append((meta_path, {
+            'name': layer_name, 'index': index_name, 'url': f"{layer_name}/{{z}}/{{x}}/{{y}}.png",
+            'minzoom': plan['min_zoom'], 'maxzoom': plan['max_zoom'],
+            'bounds': [west, south, east, north], 'center': [(west + east) / 2, (south + north) / 2],
+            'legend': [{'label': label, 'color': color} for _, color, label in rules],
+            'fingerprint': fingerprint,
+        }))
+
+    tile_counts = {}
+    if NUM_WORKERS <= 1:
+        for job in jobs:
+            tile_counts[job[2]] = tile_counts.get(job[2], 0) + render_tile_batch(*job)
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
+            futures = {executor.submit(render_tile_batch, *job): job[2] for job in jobs}
+            for future in as_completed(futures):
+                layer_dir = futures[future]
+                tile_counts[layer_dir] = tile_counts.get(layer_dir, 0) + future.result()
+
+    # 모든 타일이 만들어진 뒤에 tiles.json을 써서, 중간에 멈춘 레이어는 다음 실행에서 다시 생성되도록 함
+    for meta_path, meta in pending:
+        meta['tiles'] = tile_counts.get(os.path.dirname(meta_path), 0)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        print(f"   [성공] '{meta['name']}' 타일 {meta['tiles']}개 저장 완료")
+
+    write_layers_index(TILE_OUTPUT_FOLDER)
+
+
 # === ★★★ 수정된 main 함수 ★★★ ===
 def main():
     """메인 실행 함수"""
-    setup_qgis_environment()
-    from qgis.core import QgsApplication
+    qgs = None
+    if RENDER_ENGINE == 'qgis':
+        setup_qgis_environment()
+        from qgis.core import QgsApplication
 
-    qgs = QgsApplication([], False)
-    qgs.initQgis()
+        qgs = QgsApplication([], False)
+        qgs.initQgis()
 
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
@@ -291,12 +730,21 @@ def main():
 
     if not raster_files:
         print(f"입력 폴더에 .tif 또는 .tiff 파일이 없습니다: {INPUT_FOLDER}")
-        qgs.exitQgis()
+        if qgs is not None:
+            qgs.exitQgis()
         return
 
     print(f"\n총 {len(raster_files)}개의 파일을 확인합니다...")
 
-    valid_index_names = list(CLASSIFICATION_MAP.keys())
+    classification_map = load_classification_rules()
+
+    # 렌더링 엔진에 따라 파일별 처리 함수 선택
+    if RENDER_ENGINE == 'qgis':
+        classified_renderer, rgb_renderer = process_raster, convert_rgb_to_png
+    else:
+        classified_renderer, rgb_renderer = render_classified_png, render_rgb_png
+    tasks = []
+    tile_layers = []
 
     for file_path in raster_files:
         filename_base = os.path.basename(file_path)
@@ -307,14 +755,16 @@ def main():
         # --- 파일 처리 로직 변경 ---
         # 1. 파일 이름에 'RGB'가 포함되어 있는지 먼저 확인
         if 'RGB' in filename_upper:
-            convert_rgb_to_png(file_path, output_path)
+            tasks.append((rgb_renderer, (file_path, output_path)))
             continue  # 다음 파일로 넘어감
 
         # 2. 'RGB'가 없다면, 유효한 식생 지수 이름이 있는지 확인
         found_rule = False
-        for index_name, rules in CLASSIFICATION_MAP.items():
+        for index_name, rules in classification_map.items():
             if index_name in filename_upper:
-                process_raster(file_path, output_path, rules)
+                tasks.append((classified_renderer, (file_path, output_path, rules)))
+                if EXPORT_XYZ_TILES:
+                    tile_layers.append((file_path, base_name_no_ext, index_name, rules))
                 found_rule = True
                 break  # 맞는 규칙을 찾았으므로 더 이상 찾지 않음
 
@@ -324,7 +774,16 @@ def main():
                 f"-> '{filename_base}' 파일은 RGB도 아니고 유효한 식생 지수도 아니므로 건너<binary data, 2 bytes><binary data, 2 bytes><binary data, 2 bytes>니다.")
         # --- 로직 끝 ---
 
-    qgs.exitQgis()
+    run_render_tasks(tasks)
+
+    if tile_layers:
+        try:
+            export_xyz_tiles(tile_layers)
+        except ImportError:
+            print("   [경고] rasterio/numpy가 없는 QGIS 환경이라 XYZ 타일 내보내기를 건너뜁니다.")
+
+    if qgs is not None:
+        qgs.exitQgis()
     print("\n모든 작업이 완료되었습니다.")
 
 if __name__ == '__main__':
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import csv
 import glob
+import json
+import hashlib
 import rasterio
+from rasterio.windows import Window
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
@@ -9,6 +14,14 @@ import matplotlib.font_manager as fm
 # --- 1. 사용자 설정 부분 ---
 INPUT_FOLDER = 'data/생육데이터/2.화성_6차'  # 입력 폴더 경로
 OUTPUT_FOLDER = 'ata/생육데이터/2.화성_6차_histogram'  # 출력 폴더 경로
+HIST_RANGE = (-2.0, 5.0)  # 히스토그램 범위 (이 범위 밖의 값은 제외)
+HIST_BIN_WIDTH = 0.005  # 구간 폭: 모든 래스터가 같은 경계를 쓰므로 구간별 픽셀 수를 그대로 더할 수 있음
+HIST_MEMORY_MB = 64  # 한 번에 읽는 최대 메모리 (파일 크기와 무관)
+SAVE_INDEX_HISTOGRAMS = True  # 지수별로 모든 래스터의 히스토그램을 합산한 그래프({지수}_all_histogram.png)도 저장
+SIDECAR_FOLDER = 'data/생육데이터/histogram_sidecars'  # 래스터별 히스토그램/모멘트 사이드카(JSON) 저장 폴더 (지역/회차 공용)
+REGION_PREFIX_MAP = {'GJR': 'GJ', 'HSR': 'HS'}  # 필지 ID 접두어 -> 지역 (김제, 화성 / 없으면 접두어 그대로)
+SUMMARY_GROUP_BY = ('index', 'session')  # 실행 후 분포 요약(histogram_summary.csv)을 묶을 항목 ('index', 'session', 'region', 'field')
+SUMMARY_PERCENTILES = [10, 50, 90]  # 분포 요약에 넣을 백분위수
 # -------------------------
 
 # --- 처리 대상 식생 지수 목록 ---
@@ -18,73 +31,310 @@ VALID_INDEX_NAMES = ['OSAVI', 'GNDVI', 'NDVI', 'LCI', 'NDRE']
 
 # -------------------------
 
-def create_raster_histogram(raster_path, output_path):
-    """단일 래스터 파일의 히스토그램을 생성하고 통계를 출력합니다."""
+def histogram_edges():
+    """모든 래스터/지수가 함께 쓰는 고정 구간 경계 (HIST_RANGE를 HIST_BIN_WIDTH 간격으로 나눔, 합산 가능)"""
+    low, high = HIST_RANGE
+    n_bins = int(round((high - low) / HIST_BIN_WIDTH))
+    return np.linspace(low, high, n_bins + 1)
+
+
+def empty_histogram_stats(edges):
+    """누적 전의 빈 히스토그램/모멘트 (accumulate_histogram 반환 형식)"""
+    return {'counts': np.zeros(len(edges) - 1, dtype='int64'), 'total_pixels': 0, 'n': 0,
+            'sum': 0.0, 'sum_sq': 0.0, 'min': None, 'max': None}
+
+
+def add_values(stats, values, edges, nodata_value=None):
+    """
+    픽셀값 묶음을 고정 구간 히스토그램과 모멘트(stats)에 더하는 함수
+    - 유효 픽셀: NoData가 아니고 HIST_RANGE 범위 안 (양끝 제외, 기존 -2 < 값 < 5 기준과 동일)
+    """
+    low, high = edges[0], edges[-1]
+    n_bins = len(edges) - 1
+    values = np.asarray(values, dtype='float64').ravel()
+    valid = (values > low) & (values < high)
+    if nodata_value is not None:
+        valid &= values != nodata_value
+    values = values[valid]
+    if values.size == 0:
+        return stats
+
+    bins = np.minimum(((values - low) / HIST_BIN_WIDTH).astype('int64'), n_bins - 1)
+    # 경계값 바로 위/아래의 나눗셈 반올림 오차 보정 (np.histogram과 같은 '이상 ~ 미만' 구간)
+    bins -= values < edges[bins]
+    bins += (values >= edges[np.minimum(bins + 1, n_bins)]) & (bins < n_bins - 1)
+    stats['counts'] += np.bincount(bins, minlength=n_bins)
+    stats['n'] += int(values.size)
+    stats['sum'] += float(values.sum())
+    stats['sum_sq'] += float(np.dot(values, values))
+    stats['min'] = float(values.min()) if stats['min'] is None else min(stats['min'], float(values.min()))
+    stats['max'] = float(values.max()) if stats['max'] is None else max(stats['max'], float(values.max()))
+    return stats
+
+
+def accumulate_histogram(raster_path, edges):
+    """
+    래스터를 행 묶음 단위(HIST_MEMORY_MB 이내)로 읽으며 고정 구간 히스토그램과 요약 모멘트를 누적하는 함수
+    - 반환: {'counts': 구간별 픽셀 수, 'total_pixels': 원본 전체 픽셀 수, 'n', 'sum', 'sum_sq', 'min', 'max'}
+    """
+    stats = empty_histogram_stats(edges)
+
+    with rasterio.open(raster_path) as src:
+        block_rows = src.block_shapes[0][0]
+        rows_per_chunk = max(1, int(HIST_MEMORY_MB * 1024 * 1024 // (src.width * 8 * 3)))
+        rows_per_chunk = max(block_rows, rows_per_chunk // block_rows * block_rows)
+        stats['total_pixels'] = src.width * src.height
+
+        for row_off in range(0, src.height, rows_per_chunk):
+            window = Window(0, row_off, src.width, min(rows_per_chunk, src.height - row_off))
+            add_values(stats, src.read(1, window=window), edges, src.nodata)
+
+    return stats
+
+
+# === 히스토그램 사이드카 (래스터별 요약 파일) ===
+def raster_fingerprint(raster_path):
+    """파일 이름/크기/수정시각과 구간 설정으로 만든 지문. 사이드카의 지문이 같으면 래스터를 다시 읽지 않음"""
+    stat = os.stat(raster_path)
+    key = json.dumps([os.path.basename(raster_path), stat.st_size, stat.st_mtime_ns, list(HIST_RANGE), HIST_BIN_WIDTH])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def parse_raster_name(raster_path, index_name):
+    """
+    파일명에서 필지/회차/날짜/지역을 추출하는 함수
+    파일명 형식 예시: HSR1_01_250619_NDVI.tif -> 필지 'HSR1', 회차 '01', 날짜 '250619', 지역 'HS'
+    (지역은 필지 ID 앞의 영문 접두어를 REGION_PREFIX_MAP으로 변환)
+    """
+    parts = os.path.splitext(os.path.basename(raster_path))[0].split('_')
+    field = parts[0] if len(parts) >= 4 else ''
+    match = re.match(r"([a-zA-Z]+)(\d+)", field)
+    return {
+        'field': field,
+        'session': parts[1] if len(parts) >= 4 else '',
+        'date': parts[2] if len(parts) >= 4 else '',
+        'region': REGION_PREFIX_MAP.get(match.group(1).upper(), match.group(1).upper()) if match else field,
+        'index': index_name,
+    }
+
+
+def sidecar_path(raster_path, sidecar_folder=None):
+    """래스터의 사이드카 경로: {SIDECAR_FOLDER}/{파일명}.hist.json"""
+    base_name_no_ext = os.path.splitext(os.path.basename(raster_path))[0]
+    return os.path.join(sidecar_folder or SIDECAR_FOLDER, f"{base_name_no_ext}.hist.json")
+
+
+def load_sidecar(path):
+    """사이드카(JSON)를 읽어 구간별 픽셀 수를 전체 구간 배열로 펼쳐 반환"""
+    with open(path, encoding='utf-8') as f:
+        sidecar = json.load(f)
+    n_bins = int(round((sidecar['range'][1] - sidecar['range'][0]) / sidecar['bin_width']))
+    counts = np.zeros(n_bins, dtype='int64')
+    stored = np.asarray(sidecar['counts'], dtype='int64')
+    counts[sidecar['offset']:sidecar['offset'] + stored.size] = stored
+    sidecar['counts'] = counts
+    return sidecar
+
+
+def save_sidecar(sidecar, path):
+    """값이 있는 구간만 (시작 위치, 픽셀 수 목록)으로 줄여 사이드카(JSON)로 저장"""
+    counts = sidecar['counts']
+    nonzero = np.flatnonzero(counts)
+    first, last = (nonzero[0], nonzero[-1] + 1) if nonzero.size else (0, 0)
+    stored = dict(sidecar, offset=int(first), counts=counts[first:last].tolist())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stored, f, ensure_ascii=False)
+
+
+def build_histogram_sidecar(raster_path, index_name, edges):
+    """
+    래스터의 히스토그램 사이드카를 반환하는 함수
+    - 기존 사이드카의 지문이 같으면 그대로 읽고 (래스터를 읽지 않음), 없거나 다르면 다시 계산하여 저장
+    """
+    path = sidecar_path(raster_path)
+    fingerprint = raster_fingerprint(raster_path)
+    if os.path.exists(path):
+        sidecar = load_sidecar(path)
+        if sidecar.get('fingerprint') == fingerprint:
+            print(f"   [캐시] 원본이 바뀌지 않아 사이드카를 사용합니다: {os.path.basename(path)}")
+            return sidecar
+
+    stats = accumulate_histogram(raster_path, edges)
+    sidecar = {'raster': os.path.basename(raster_path), 'fingerprint': fingerprint}
+    sidecar.update(parse_raster_name(raster_path, index_name))
+    sidecar.update({'range': list(HIST_RANGE), 'bin_width': HIST_BIN_WIDTH})
+    sidecar.update(stats)
+    save_sidecar(sidecar, path)
+    return sidecar
+
+
+def load_sidecars(sidecar_folder=None, **filters):
+    """
+    사이드카 폴더의 모든 사이드카 중 조건에 맞는 것만 읽는 함수
+    - filters 예시: index='NDVI', session=['01', '02'], region='HS' (값 하나 또는 목록)
+    """
+    sidecars = []
+    for path in sorted(glob.glob(os.path.join(sidecar_folder or SIDECAR_FOLDER, '*.hist.json'))):
+        sidecar = load_sidecar(path)
+        if all(sidecar.get(key) in (value if isinstance(value, (list, tuple, set)) else [value])
+               for key, value in filters.items()):
+            sidecars.append(sidecar)
+    return sidecars
+
+
+def merge_histograms(sidecars):
+    """
+    여러 사이드카의 구간별 픽셀 수와 모멘트를 합산하는 함수 (같은 구간 설정끼리만 가능)
+    반환: {'counts', 'n', 'sum', 'sum_sq', 'min', 'max', 'mean', 'std', 'range', 'bin_width', 'rasters'}
+    """
+    if not sidecars:
+        raise ValueError("합산할 사이드카가 없습니다.")
+    range_, bin_width = sidecars[0]['range'], sidecars[0]['bin_width']
+    for sidecar in sidecars:
+        if sidecar['range'] != range_ or sidecar['bin_width'] != bin_width:
+            raise ValueError(f"구간 설정이 다른 사이드카는 합산할 수 없습니다: {sidecar['raster']}")
+
+    n = sum(sidecar['n'] for sidecar in sidecars)
+    value_sum = sum(sidecar['sum'] for sidecar in sidecars)
+    value_sum_sq = sum(sidecar['sum_sq'] for sidecar in sidecars)
+    mins = [sidecar['min'] for sidecar in sidecars if sidecar['n']]
+    maxs = [sidecar['max'] for sidecar in sidecars if sidecar['n']]
+    mean = value_sum / n if n else None
+    return {
+        'counts': sum(sidecar['counts'] for sidecar in sidecars), 'n': n, 'sum': value_sum, 'sum_sq': value_sum_sq,
+        'min': min(mins) if mins else None, 'max': max(maxs) if maxs else None,
+        'mean': mean, 'std': float(np.sqrt(max(value_sum_sq / n - mean ** 2, 0.0))) if n else None,
+        'range': range_, 'bin_width': bin_width, 'rasters': [sidecar['raster'] for sidecar in sidecars],
+    }
+
+
+def histogram_percentiles(merged, percentiles):
+    """
+    합산 히스토그램에서 백분위수를 계산하는 함수 (구간 안에서는 균등 분포로 보고 선형 보간, 오차는 구간 폭 이내)
+    - percentiles: 0~100 값 또는 목록 / 반환: 같은 모양의 값 (실제 최소/최대값 범위로 제한)
+    """
+    counts = merged['counts']
+    edges = np.linspace(merged['range'][0], merged['range'][1], counts.size + 1)
+    cumulative = np.concatenate([[0], np.cumsum(counts)])
+    ranks = np.asarray(percentiles, dtype='float64') / 100 * merged['n']
+    # 누적 픽셀 수가 순위에 처음 도달하는 구간을 찾아 그 안에서 보간
+    bins = np.clip(np.searchsorted(cumulative, ranks, side='left') - 1, 0, counts.size - 1)
+    fraction = (ranks - cumulative[bins]) / np.maximum(counts[bins], 1)
+    values = edges[bins] + np.clip(fraction, 0, 1) * merged['bin_width']
+    return np.clip(values, merged['min'], merged['max'])
+
+
+def group_histograms(sidecars, by=('index',)):
+    """사이드카를 by 항목(예: 'index', 'session', 'region', 'field')별로 묶어 합산. 반환: {(항목값, ...): 합산 결과}"""
+    groups = {}
+    for sidecar in sidecars:
+        groups.setdefault(tuple(sidecar[key] for key in by), []).append(sidecar)
+    return {key: merge_histograms(members) for key, members in sorted(groups.items())}
+
+
+def query_histograms(by=('index',), sidecar_folder=None, **filters):
+    """
+    저장된 사이드카만으로 (래스터를 읽지 않고) 조건에 맞는 히스토그램을 묶어 합산하는 조회 함수
+    사용 예: query_histograms(by=('index', 'session'), region='HS')
+    """
+    return group_histograms(load_sidecars(sidecar_folder, **filters), by)
+
+
+def save_distribution_summary(groups, by, output_path):
+    """묶음별 픽셀 수/평균/표준편차/최소/백분위수/최대를 출력하고 CSV로 저장"""
+    header = list(by) + ['n', 'mean', 'std', 'min'] + [f"p{q}" for q in SUMMARY_PERCENTILES] + ['max']
+    rows = []
+    for key, merged in groups.items():
+        if merged['n'] == 0:
+            continue
+        row = list(key) + [merged['n'], merged['mean'], merged['std'], merged['min']]
+        row += [float(v) for v in histogram_percentiles(merged, SUMMARY_PERCENTILES)] + [merged['max']]
+        rows.append(row)
+        print(f"   | {' / '.join(str(k) for k in key):<20} | n={merged['n']:>9} | 평균 {merged['mean']:.4f} | "
+              + ' '.join(f"p{q}={v:.4f}" for q, v in zip(SUMMARY_PERCENTILES, row[len(by) + 4:-1])) + " |")
+
+    with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print(f"   [성공] 분포 요약 저장 완료: {os.path.basename(output_path)}")
+
+
+def plot_histogram(counts, edges, title, output_path):
+    """미리 계산한 구간별 픽셀 수로 히스토그램을 그리고 상위 구간/1·2차 피크를 출력하는 함수"""
+    print("   [분석] 픽셀 수가 가장 많은 상위 5개 구간(Bin):")
+    sorted_indices = np.argsort(counts, kind='stable')[::-1]
+
+    print("   -----------------------------------------")
+    print("   | 순위 |      구간 (Value)     | 픽셀 수 |")
+    print("   -----------------------------------------")
+    for i in range(5):
+        if i < len(sorted_indices):
+            index = sorted_indices[i]
+            bin_start = edges[index]
+            bin_end = edges[index + 1]
+            count = counts[index]
+            print(f"   |  {i + 1}   | {bin_start:.4f} - {bin_end:.4f} | {count:>7} |")
+    print("   -----------------------------------------")
+
+    peak1_index = sorted_indices[0]
+    peak1_value = (edges[peak1_index] + edges[peak1_index + 1]) / 2
+    peak1_count = counts[peak1_index]
+
+    peak2_index = sorted_indices[1]
+    peak2_value = (edges[peak2_index] + edges[peak2_index + 1]) / 2
+    peak2_count = counts[peak2_index]
+
+    # 고정 구간은 범위가 넓으므로 값이 있는 구간만 그림
+    nonzero = np.flatnonzero(counts)
+    first, last = nonzero[0], nonzero[-1] + 1
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+    # 픽셀 대신 구간 시작값에 픽셀 수를 가중치로 주어 같은 막대를 그림
+    ax.hist(edges[first:last], bins=edges[first:last + 1], weights=counts[first:last],
+            color='skyblue', edgecolor='black')
+    ax.axvline(peak1_value, color='red', linestyle='--', linewidth=2, label=f'1st Peak: {peak1_value:.4f}')
+    ax.text(peak1_value, peak1_count, f' 1st Peak\n {peak1_value:.4f}', color='red', ha='left', va='bottom',
+            fontsize=12, weight='bold')
+    ax.axvline(peak2_value, color='purple', linestyle=':', linewidth=2, label=f'2nd Peak: {peak2_value:.4f}')
+    ax.text(peak2_value, peak2_count, f' 2nd Peak\n {peak2_value:.4f}', color='purple', ha='right', va='bottom',
+            fontsize=12, weight='bold')
+
+    ax.set_title(title, fontsize=16)
+    ax.set_xlabel('Vegetation Index Value', fontsize=12)
+    ax.set_ylabel('Pixel Count (Frequency)', fontsize=12)
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend()
+
+    fig.savefig(output_path, dpi=150)
+    plt.close(fig)
+
+
+def create_raster_histogram(raster_path, output_path, edges=None, index_name=''):
+    """
+    단일 래스터 파일의 히스토그램을 생성하고 통계를 출력합니다.
+    반환: 히스토그램 사이드카 (지수별 합산용, 유효 데이터가 부족하거나 오류면 None)
+    """
     print(f"-> 처리 중: {os.path.basename(raster_path)}")
+    if edges is None:
+        edges = histogram_edges()
     try:
-        with rasterio.open(raster_path) as src:
-            image_data = src.read(1)
-            nodata_value = src.nodata
+        sidecar = build_histogram_sidecar(raster_path, index_name, edges)
+        counts = sidecar['counts']
+        print(f"Original pixel count (incl. NoData if any): {sidecar['total_pixels']}")  # 원본 픽셀 수 추가
+        print(f"   [정보] 분석할 총 픽셀 수: {sidecar['n']}")
 
-        if nodata_value is not None:
-            valid_data = image_data[image_data != nodata_value].flatten()
-        else:
-            valid_data = image_data.flatten()
+        if sidecar['n'] < 2:
+            print("   [경고] 분석할 유효한 데이터가 부족합니다. 건너뜁니다.")
+            return None
 
-        print(f"Original pixel count (incl. NoData if any): {image_data.size}")  # 원본 픽셀 수 추가
-
-        valid_data = valid_data[(valid_data > -2) & (valid_data < 5)]
-        print(f"   [정보] 분석할 총 픽셀 수: {valid_data.size}")
-
-        if valid_data.size < 2:
-            print("   [경고] 분석할 유효한 데이터가 부족합니다. 건너<binary data, 2 bytes><binary data, 2 bytes><binary data, 2 bytes>니다.")
-            return
-
-        counts, bin_edges = np.histogram(valid_data, bins=256)
-
-        print("   [분석] 픽셀 수가 가장 많은 상위 5개 구간(Bin):")
-        sorted_indices = np.argsort(counts)[::-1]
-
-        print("   -----------------------------------------")
-        print("   | 순위 |      구간 (Value)     | 픽셀 수 |")
-        print("   -----------------------------------------")
-        for i in range(5):
-            if i < len(sorted_indices):
-                index = sorted_indices[i]
-                bin_start = bin_edges[index]
-                bin_end = bin_edges[index + 1]
-                count = counts[index]
-                print(f"   |  {i + 1}   | {bin_start:.4f} - {bin_end:.4f} | {count:>7} |")
-        print("   -----------------------------------------")
-
-        peak1_index = sorted_indices[0]
-        peak1_value = (bin_edges[peak1_index] + bin_edges[peak1_index + 1]) / 2
-        peak1_count = counts[peak1_index]
-
-        peak2_index = sorted_indices[1]
-        peak2_value = (bin_edges[peak2_index] + bin_edges[peak2_index + 1]) / 2
-        peak2_count = counts[peak2_index]
-
-        fig, ax = plt.subplots(figsize=(12, 7))
-        ax.hist(valid_data, bins=256, color='skyblue', edgecolor='black')
-        ax.axvline(peak1_value, color='red', linestyle='--', linewidth=2, label=f'1st Peak: {peak1_value:.4f}')
-        ax.text(peak1_value, peak1_count, f' 1st Peak\n {peak1_value:.4f}', color='red', ha='left', va='bottom',
-                fontsize=12, weight='bold')
-        ax.axvline(peak2_value, color='purple', linestyle=':', linewidth=2, label=f'2nd Peak: {peak2_value:.4f}')
-        ax.text(peak2_value, peak2_count, f' 2nd Peak\n {peak2_value:.4f}', color='purple', ha='right', va='bottom',
-                fontsize=12, weight='bold')
-
-        ax.set_title(f'{os.path.basename(raster_path)} - Pixel Value Distribution', fontsize=16)
-        ax.set_xlabel('Vegetation Index Value', fontsize=12)
-        ax.set_ylabel('Pixel Count (Frequency)', fontsize=12)
-        ax.grid(True, linestyle='--', alpha=0.6)
-        ax.legend()
-
-        plt.savefig(output_path, dpi=150)
-        plt.close(fig)
+        plot_histogram(counts, edges, f'{os.path.basename(raster_path)} - Pixel Value Distribution', output_path)
+        return sidecar
 
     except Exception as e:
         print(f"   [오류] 처리 중 문제가 발생했습니다: {e}")
+        return None
 
 
 # === ★★★ 수정된 main 함수 ★★★ ===
@@ -111,15 +361,17 @@ def main():
         print(f"\n총 {len(raster_files)}개의 TIF 파일을 확인합니다...")
 
         processed_count = 0  # 처리된 파일 수를 세기 위한 변수
+        edges = histogram_edges()
+        sidecars = []  # 래스터별 히스토그램 사이드카 (픽셀 대신 구간별 픽셀 수와 모멘트만 보관)
 
         for raster_path in raster_files:
             filename_base = os.path.basename(raster_path)
             filename_upper = filename_base.upper()  # 대소문자 구분 없이 비교
 
             # --- 파일 이름에 유효한 식생 지수 이름이 포함되어 있는지 확인 ---
-            is_valid_file = any(index_name in filename_upper for index_name in VALID_INDEX_NAMES)
+            matched_index = next((index_name for index_name in VALID_INDEX_NAMES if index_name in filename_upper), None)
 
-            if not is_valid_file:
+            if matched_index is None:
                 print(
                     f"-> '{filename_base}' 파일 이름에 유효한 식생 지수가 없어 건너<binary data, 2 bytes><binary data, 2 bytes><binary data, 2 bytes>니다.")
                 continue  # 다음 파일로 넘어감
@@ -130,9 +382,22 @@ def main():
             output_filename = f"{base_name_no_ext}_histogram.png"
             output_path = os.path.join(OUTPUT_FOLDER, output_filename)
 
-            create_raster_histogram(raster_path, output_path)
+            sidecar = create_raster_histogram(raster_path, output_path, edges, matched_index)
+            if sidecar is not None:
+                sidecars.append(sidecar)
             processed_count += 1  # 처리된 파일 수 증가
 
+        if SAVE_INDEX_HISTOGRAMS:
+            for (index_name,), merged in group_histograms(sidecars, by=('index',)).items():
+                print(f"-> {index_name} 지수 전체 합산 히스토그램 (총 픽셀 수: {merged['n']})")
+                output_path = os.path.join(OUTPUT_FOLDER, f"{index_name}_all_histogram.png")
+                plot_histogram(merged['counts'], edges, f'{index_name} (All Rasters) - Pixel Value Distribution', output_path)
+
+        if sidecars:
+            print(f"\n[분포 요약] {' / '.join(SUMMARY_GROUP_BY)}별")
+            save_distribution_summary(group_histograms(sidecars, by=SUMMARY_GROUP_BY), SUMMARY_GROUP_BY,
+                                      os.path.join(OUTPUT_FOLDER, 'histogram_summary.csv'))
+
         print(f"\n--- 총 {processed_count}개의 유효한 파일에 대한 작업이 완료되었습니다. ---")
         print(f"결과물은 '{OUTPUT_FOLDER}' 폴더에 저장되었습니다.")
 
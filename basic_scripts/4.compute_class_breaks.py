@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import importlib.util
+from datetime import datetime
+
+import numpy as np
+
+# --- 1. 사용자 설정 부분 ---
+SIDECAR_FOLDER = 'data/생육데이터/histogram_sidecars'  # 2.create_histogram.py가 저장한 히스토그램 사이드카 폴더
+OUTPUT_FILE = 'data/생육데이터/classification_rules.json'  # 1.process_batch_tif.py의 CLASSIFICATION_RULES_FILE로 지정
+BREAK_METHOD = 'jenks'  # 'quantile': 등급별 픽셀 수가 같도록, 'equal_interval': 같은 간격, 'jenks': 자연 분류(등급 내 분산 최소)
+N_CLASSES = 5  # 등급 수 (CLASS_COLORS 개수 이하)
+CLASS_COLORS = ['#c51f1e', '#f5a361', '#faf7be', '#a1d193', '#447cb9']  # 낮은 등급 -> 높은 등급 색상 (기존 규칙집과 동일)
+SIDECAR_FILTERS = {}  # 사용할 사이드카 조건 (예: {'region': ['HS', 'GJ'], 'session': ['02', '03']}, 비우면 전체)
+EQUAL_INTERVAL_PERCENTILES = (1, 99)  # 'equal_interval'의 범위 (극단값 영향을 줄이기 위해 백분위수 사용)
+BREAK_DECIMALS = 2  # 경계값 반올림 자릿수 (기존 규칙집과 같은 소수 둘째 자리)
+# -------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename, module_name):
+    """파일명이 숫자로 시작하는 스크립트(2.create_histogram.py 등)를 모듈로 불러옵니다."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# 사이드카 조회/합산/백분위수 함수는 2.create_histogram.py의 것을 그대로 사용
+histogram = load_script('2.create_histogram.py', 'create_histogram')
+
+
+def bin_centers(merged):
+    """합산 히스토그램의 구간 경계와 중앙값"""
+    edges = np.linspace(merged['range'][0], merged['range'][1], merged['counts'].size + 1)
+    return edges, (edges[:-1] + edges[1:]) / 2
+
+
+def quantile_breaks(merged, n_classes):
+    """등급별 픽셀 수가 같아지는 경계값 (합산 히스토그램의 백분위수)"""
+    percentiles = [100 * k / n_classes for k in range(1, n_classes)]
+    return list(histogram.histogram_percentiles(merged, percentiles))
+
+
+def equal_interval_breaks(merged, n_classes):
+    """EQUAL_INTERVAL_PERCENTILES 범위를 같은 간격으로 나눈 경계값"""
+    low, high = histogram.histogram_percentiles(merged, EQUAL_INTERVAL_PERCENTILES)
+    return [low + (high - low) * k / n_classes for k in range(1, n_classes)]
+
+
+def jenks_breaks(merged, n_classes):
+    """
+    Jenks 자연 분류 경계값을 히스토그램 구간 단위로 계산하는 함수
+    - 픽셀 대신 (구간 중앙값, 픽셀 수)를 가중치로 쓰는 동적 계획법: 등급 내 제곱편차 합이 최소가 되도록 구간 사이에서 경계 선택
+    - 계산량은 픽셀 수와 무관하게 값이 있는 구간 수 B에 대해 O(등급 수 x B^2)
+    - 경계값은 구간 경계이므로 '경계값 이상 ~ 다음 경계값 미만' 분류와 정확히 일치
+    """
+    edges, centers = bin_centers(merged)
+    nonzero = np.flatnonzero(merged['counts'])
+    first, last = nonzero[0], nonzero[-1] + 1
+    weights = merged['counts'][first:last].astype('float64')
+    centers = centers[first:last]
+    n_bins = weights.size
+    if n_bins < n_classes:
+        raise ValueError(f"값이 있는 구간({n_bins}개)이 등급 수({n_classes})보다 적습니다.")
+
+    # 누적합으로 임의의 구간 묶음 [i, j)의 제곱편차 합을 O(1)에 계산
+    cum_w = np.concatenate([[0.0], np.cumsum(weights)])
+    cum_wx = np.concatenate([[0.0], np.cumsum(weights * centers)])
+    cum_wxx = np.concatenate([[0.0], np.cumsum(weights * centers ** 2)])
+    start = np.arange(n_bins + 1)[:, None]
+    end = np.arange(n_bins + 1)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = cum_w[end] - cum_w[start]
+        wx = cum_wx[end] - cum_wx[start]
+        cost = np.where(w > 0, (cum_wxx[end] - cum_wxx[start]) - wx ** 2 / w, 0.0)
+    cost[start >= end] = np.inf  # 빈 등급은 허용하지 않음
+
+    # best[k][j]: 앞의 j개 구간을 k+1개 등급으로 나눌 때의 최소 비용, choice: 마지막 등급의 시작 구간
+    best = cost[0].copy()
+    choices = []
+    for _ in range(1, n_classes):
+        total = best[:, None] + cost
+        choice = np.argmin(total, axis=0)
+        best = total[choice, np.arange(n_bins + 1)]
+        choices.append(choice)
+
+    cuts = []
+    j = n_bins
+    for choice in reversed(choices):
+        j = choice[j]
+        cuts.append(j)
+    return [edges[first + cut] for cut in reversed(cuts)]
+
+
+BREAK_FUNCTIONS = {
+    'quantile': quantile_breaks,
+    'equal_interval': equal_interval_breaks,
+    'jenks': jenks_breaks,
+}
+
+
+def breaks_to_rules(breaks):
+    """경계값 목록을 1.process_batch_tif.py 규칙집 형식 [(경계값, 색상, 라벨), ..., ('max', 색상, 라벨)]으로 변환"""
+    fmt = f".{BREAK_DECIMALS}f"
+    rules = [(breaks[0], CLASS_COLORS[0], f"< {breaks[0]:{fmt}}")]
+    for k in range(1, len(breaks)):
+        rules.append((breaks[k], CLASS_COLORS[k], f"{breaks[k - 1]:{fmt}} - {breaks[k]:{fmt}}"))
+    rules.append(('max', CLASS_COLORS[len(breaks)], f">= {breaks[-1]:{fmt}}"))
+    return rules
+
+
+def compute_class_breaks(merged, method=BREAK_METHOD, n_classes=N_CLASSES):
+    """합산 히스토그램 하나에서 경계값을 계산하고 BREAK_DECIMALS 자리로 반올림 (반올림 후 겹치는 경계는 오류)"""
+    if method not in BREAK_FUNCTIONS:
+        raise ValueError(f"알 수 없는 BREAK_METHOD: {method} ({', '.join(BREAK_FUNCTIONS)})")
+    if n_classes > len(CLASS_COLORS):
+        raise ValueError(f"N_CLASSES({n_classes})가 CLASS_COLORS 개수({len(CLASS_COLORS)})보다 많습니다.")
+
+    breaks = [round(float(value), BREAK_DECIMALS) for value in BREAK_FUNCTIONS[method](merged, n_classes)]
+    if any(high <= low for low, high in zip(breaks, breaks[1:])):
+        raise ValueError(f"반올림한 경계값이 겹칩니다: {breaks} (BREAK_DECIMALS를 늘리거나 N_CLASSES를 줄이세요)")
+    return breaks
+
+
+def class_counts(merged, breaks):
+    """경계값별 등급 픽셀 수 (구간 경계에 맞지 않는 경계값은 구간 안에서 균등 분포로 나눔)"""
+    edges, _ = bin_centers(merged)
+    cumulative = np.concatenate([[0], np.cumsum(merged['counts'])])
+    at_breaks = np.interp(breaks, edges, cumulative)
+    return np.diff(np.concatenate([[0], at_breaks, [merged['n']]]))
+
+
+def main():
+    """메인 실행 함수"""
+    print(f"등급 경계 계산 시작: {BREAK_METHOD}, {N_CLASSES}등급 (사이드카: {SIDECAR_FOLDER})")
+    sidecars = histogram.load_sidecars(SIDECAR_FOLDER, **SIDECAR_FILTERS)
+    if not sidecars:
+        print(f"[오류] 조건에 맞는 사이드카가 없습니다. 2.create_histogram.py를 먼저 실행하세요: {SIDECAR_FOLDER}")
+        return
+
+    output = {
+        'method': BREAK_METHOD, 'n_classes': N_CLASSES, 'filters': SIDECAR_FILTERS,
+        'created': datetime.now().isoformat(timespec='seconds'), 'rules': {}, 'sources': {},
+    }
+    for (index_name,), merged in histogram.group_histograms(sidecars, by=('index',)).items():
+        if merged['n'] == 0:
+            continue
+        try:
+            breaks = compute_class_breaks(merged, BREAK_METHOD, N_CLASSES)
+        except ValueError as e:
+            print(f"   [경고] {index_name}: {e}")
+            continue
+
+        rules = breaks_to_rules(breaks)
+        output['rules'][index_name] = rules
+        output['sources'][index_name] = {'rasters': len(merged['rasters']), 'pixels': merged['n']}
+
+        print(f"-> {index_name}: 래스터 {len(merged['rasters'])}개, 픽셀 {merged['n']}개")
+        for (_, color, label), count in zip(rules, class_counts(merged, breaks)):
+            print(f"   | {label:<18}| {color} | {count / merged['n'] * 100:>6.2f}% |")
+
+    if not output['rules']:
+        print("[오류] 경계값을 계산한 지수가 없습니다.")
+        return
+    os.makedirs(os.path.dirname(OUTPUT_FILE) or '.', exist_ok=True)
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"\n[성공] 규칙집 저장 완료: {OUTPUT_FILE} ({', '.join(output['rules'])})")
+    print("1.process_batch_tif.py의 CLASSIFICATION_RULES_FILE에 이 경로를 지정하면 바로 사용됩니다.")
+
+
+if __name__ == '__main__':
+    main()
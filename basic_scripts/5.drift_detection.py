@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import csv
+import glob
+import json
+import math
+import time
+import hashlib
+import importlib.util
+from datetime import datetime
+
+import numpy as np
+import rasterio
+from rasterio import features
+from rasterio.windows import Window, from_bounds
+
+# --- 1. 사용자 설정 부분 ---
+TIF_FOLDERS = ['data/생육데이터/화성', 'data/생육데이터/김제']  # 회차별 지수 TIF 폴더 (지역 여러 곳 가능)
+# 회차와 무관하게 값이 변하지 않아야 하는 기준 구역(콘크리트 농로, 창고 지붕, 보정판 위치 등) 폴리곤 GeoJSON
+# 지정하지 않으면 2.create_histogram.py의 래스터 전체 사이드카를 사용 (작물 생육 변화도 함께 잡히므로 참고용)
+REFERENCE_ZONES_FILE = None
+REFERENCE_SIDECAR_FOLDER = 'data/생육데이터/histogram_sidecars_reference'  # 기준 구역 히스토그램 사이드카 저장 폴더
+SIDECAR_FOLDER = 'data/생육데이터/histogram_sidecars'  # 기준 구역이 없을 때 사용할 래스터 전체 사이드카 폴더
+DRIFT_INDICES = ['NDVI', 'GNDVI', 'NDRE', 'OSAVI', 'LCI']  # 검사할 지수 (pre_2의 TARGET_INDICES와 같게)
+
+# [판정 기준] 회차 분포와 같은 지역/지수의 나머지 회차 중앙 분포(CDF 중앙값)의 차이
+# 픽셀 수가 많으면 아주 작은 차이도 통계적으로 유의하므로, p값 대신 차이의 크기(효과 크기)로 판정
+WASSERSTEIN_THRESHOLD = 0.03  # 1차 Wasserstein 거리 (지수 값 단위, 분포 전체가 평균적으로 이동한 양)
+KS_THRESHOLD = 0.25  # Kolmogorov-Smirnov 통계량 (누적 분포의 최대 차이, 0~1)
+MIN_REFERENCE_PIXELS = 500  # 기준 구역 유효 픽셀이 이보다 적은 회차는 판정하지 않음
+MIN_BASELINE_SESSIONS = 2  # 비교 기준을 만들 다른 회차의 최소 수
+
+DRIFT_REPORT_FILE = 'data/생육데이터/drift_report.csv'  # 회차별 지표 전체
+DRIFT_FLAGS_FILE = 'data/생육데이터/drift_flags.json'  # 드리프트 의심 회차 목록 (pre_2의 DRIFT_FLAGS_FILE로 지정)
+# -------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename, module_name):
+    """파일명이 숫자로 시작하는 스크립트(2.create_histogram.py 등)를 모듈로 불러옵니다."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# 고정 구간/사이드카 저장·조회/합산 함수는 2.create_histogram.py의 것을 그대로 사용 (같은 구간이라 서로 합산 가능)
+histogram = load_script('2.create_histogram.py', 'create_histogram')
+
+
+def zones_fingerprint(zones_file):
+    """기준 구역 GeoJSON 내용의 해시. 구역이 바뀌면 모든 기준 구역 사이드카를 다시 계산"""
+    digest = hashlib.sha1()
+    with open(zones_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def accumulate_zone_histogram(raster_path, zones, edges):
+    """
+    래스터에서 기준 구역 안의 픽셀만 고정 구간 히스토그램으로 누적하는 함수
+    - 래스터와 겹치는 구역의 범위(window)만 읽고, 구역 폴리곤 안(all_touched=False) 픽셀만 사용
+    - 구역이 겹쳐도 한 픽셀은 한 번만 셈
+    """
+    from shapely.geometry import box
+
+    stats = histogram.empty_histogram_stats(edges)
+    with rasterio.open(raster_path) as src:
+        local = zones.to_crs(src.crs) if zones.crs is not None and src.crs is not None else zones
+        left, bottom, right, top = src.bounds
+        local = local[local.intersects(box(left, bottom, right, top))]
+        if local.empty:
+            return stats
+
+        zone_left, zone_bottom, zone_right, zone_top = local.total_bounds
+        window = from_bounds(max(zone_left, left), max(zone_bottom, bottom), min(zone_right, right),
+                             min(zone_top, top), transform=src.transform)
+        col_off, row_off = math.floor(window.col_off), math.floor(window.row_off)
+        width = min(src.width, math.ceil(window.col_off + window.width)) - max(col_off, 0)
+        height = min(src.height, math.ceil(window.row_off + window.height)) - max(row_off, 0)
+        window = Window(max(col_off, 0), max(row_off, 0), width, height)
+        if width <= 0 or height <= 0:
+            return stats
+
+        data = src.read(1, window=window)
+        inside = features.geometry_mask(local.geometry, out_shape=data.shape,
+                                        transform=src.window_transform(window), invert=True)
+        stats['total_pixels'] = int(inside.sum())
+        histogram.add_values(stats, data[inside], edges, src.nodata)
+    return stats
+
+
+def build_reference_sidecars(tif_folders, zones_file, edges):
+    """
+    모든 지수 TIF의 기준 구역 히스토그램 사이드카를 만들거나 (래스터/구역 지문이 같으면) 그대로 읽는 함수
+    반환: 사이드카 목록 (2.create_histogram.py의 사이드카와 같은 형식)
+    """
+    import geopandas as gpd
+
+    zones = gpd.read_file(zones_file)
+    zone_key = zones_fingerprint(zones_file)
+    print(f"📄 기준 구역 로드: {os.path.basename(zones_file)} ({len(zones)}개 폴리곤)")
+
+    sidecars, computed = [], 0
+    for tif_folder in tif_folders:
+        for raster_path in sorted(glob.glob(os.path.join(tif_folder, '*.tif'))):
+            parts = os.path.splitext(os.path.basename(raster_path))[0].split('_')
+            index_name = next((p.upper() for p in parts if p.upper() in DRIFT_INDICES), None)
+            if len(parts) < 4 or index_name is None:
+                continue
+
+            path = histogram.sidecar_path(raster_path, REFERENCE_SIDECAR_FOLDER)
+            fingerprint = hashlib.sha1((histogram.raster_fingerprint(raster_path) + zone_key).encode('utf-8')).hexdigest()
+            if os.path.exists(path):
+                sidecar = histogram.load_sidecar(path)
+                if sidecar.get('fingerprint') == fingerprint:
+                    sidecars.append(sidecar)
+                    continue
+
+            sidecar = {'raster': os.path.basename(raster_path), 'fingerprint': fingerprint}
+            sidecar.update(histogram.parse_raster_name(raster_path, index_name))
+            sidecar.update({'range': list(histogram.HIST_RANGE), 'bin_width': histogram.HIST_BIN_WIDTH})
+            sidecar.update(accumulate_zone_histogram(raster_path, zones, edges))
+            histogram.save_sidecar(sidecar, path)
+            sidecars.append(sidecar)
+            computed += 1
+
+    print(f"   -> 기준 구역 사이드카 {len(sidecars)}개 (새로 계산 {computed}개, 재사용 {len(sidecars) - computed}개)")
+    return sidecars
+
+
+def normalized_cdf(merged):
+    """합산 히스토그램의 누적 분포 (구간 오른쪽 경계 기준, 0~1)"""
+    return np.cumsum(merged['counts']) / merged['n']
+
+
+def cdf_median(cdf, edges):
+    """누적 분포에서 중앙값 (구간 안 선형 보간)"""
+    return float(np.interp(0.5, np.concatenate([[0.0], cdf]), edges))
+
+
+def compare_sessions(sessions):
+    """
+    같은 지역/지수의 회차별 분포를 나머지 회차의 중앙 분포와 비교하는 함수
+    - sessions: {회차: 합산 히스토그램}
+    - 기준 분포: 자기 자신을 뺀 회차들의 CDF를 구간마다 중앙값으로 합친 분포 (다른 회차 하나가 틀어져도 흔들리지 않음)
+    - Wasserstein = Σ|F - G| x 구간 폭, KS = max|F - G| (구간 단위 계산이라 픽셀 수와 무관하게 O(구간 수))
+    - 반환: {회차: {'status', 'wasserstein', 'ks', 'median_shift'}}
+    """
+    results = {}
+    usable = {session: merged for session, merged in sessions.items() if merged['n'] >= MIN_REFERENCE_PIXELS}
+    cdfs = {session: normalized_cdf(merged) for session, merged in usable.items()}
+
+    for session, merged in sessions.items():
+        if session not in usable:
+            results[session] = {'status': 'insufficient', 'wasserstein': None, 'ks': None, 'median_shift': None}
+            continue
+        others = [cdf for other, cdf in cdfs.items() if other != session]
+        if len(others) < MIN_BASELINE_SESSIONS:
+            results[session] = {'status': 'no_baseline', 'wasserstein': None, 'ks': None, 'median_shift': None}
+            continue
+
+        edges = np.linspace(merged['range'][0], merged['range'][1], merged['counts'].size + 1)
+        baseline = np.median(np.stack(others), axis=0)
+        difference = np.abs(cdfs[session] - baseline)
+        wasserstein = float(difference.sum() * merged['bin_width'])
+        ks = float(difference.max())
+        drifted = wasserstein > WASSERSTEIN_THRESHOLD or ks > KS_THRESHOLD
+        results[session] = {
+            'status': 'drift' if drifted else 'ok', 'wasserstein': wasserstein, 'ks': ks,
+            'median_shift': cdf_median(cdfs[session], edges) - cdf_median(baseline, edges),
+        }
+    return results
+
+
+def detect_drift(sidecars):
+    """사이드카를 (지역, 지수, 회차)별로 합산해 회차 드리프트 지표를 계산. 반환: 보고서 행 목록"""
+    dates = {}
+    for sidecar in sidecars:
+        dates.setdefault((sidecar['region'], sidecar['session']), sidecar['date'])
+
+    groups = {}
+    for (region, index_name, session), merged in histogram.group_histograms(
+            sidecars, by=('region', 'index', 'session')).items():
+        groups.setdefault((region, index_name), {})[session] = merged
+
+    rows = []
+    for (region, index_name), sessions in sorted(groups.items()):
+        for session, result in sorted(compare_sessions(sessions).items()):
+            merged = sessions[session]
+            rows.append(dict(result, region=region, index=index_name, session=session,
+                             date=dates.get((region, session), ''), n=merged['n'], mean=merged['mean'],
+                             rasters=merged['rasters']))
+    return rows
+
+
+def save_drift_report(rows, source):
+    """회차별 지표를 CSV로, 드리프트 의심 회차를 JSON(pre_2에서 읽음)으로 저장"""
+    columns = ['region', 'index', 'session', 'date', 'status', 'wasserstein', 'ks', 'median_shift', 'n', 'mean']
+    os.makedirs(os.path.dirname(DRIFT_REPORT_FILE) or '.', exist_ok=True)
+    with open(DRIFT_REPORT_FILE, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + ['rasters'])
+        for row in rows:
+            writer.writerow([row[column] for column in columns] + [';'.join(row['rasters'])])
+
+    flags = [{key: row[key] for key in ('region', 'index', 'session', 'date', 'wasserstein', 'ks',
+                                        'median_shift', 'rasters')}
+             for row in rows if row['status'] == 'drift']
+    output = {
+        'created': datetime.now().isoformat(timespec='seconds'), 'source': source,
+        'thresholds': {'wasserstein': WASSERSTEIN_THRESHOLD, 'ks': KS_THRESHOLD}, 'flags': flags,
+    }
+    os.makedirs(os.path.dirname(DRIFT_FLAGS_FILE) or '.', exist_ok=True)
+    with open(DRIFT_FLAGS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    return flags
+
+
+def main():
+    """메인 실행 함수"""
+    print("회차별 센서/보정 드리프트 검사 시작...")
+    edges = histogram.histogram_edges()
+
+    if REFERENCE_ZONES_FILE:
+        sidecars = build_reference_sidecars(TIF_FOLDERS, REFERENCE_ZONES_FILE, edges)
+        source = 'reference_zones'
+    else:
+        print("[경고] REFERENCE_ZONES_FILE이 없어 래스터 전체 사이드카로 비교합니다. (작물 생육 변화도 드리프트로 보일 수 있음)")
+        sidecars = [sidecar for sidecar in histogram.load_sidecars(SIDECAR_FOLDER) if sidecar['index'] in DRIFT_INDICES]
+        source = 'whole_raster'
+    if not sidecars:
+        print("[오류] 비교할 히스토그램이 없습니다. (TIF_FOLDERS 또는 2.create_histogram.py의 사이드카를 확인하세요)")
+        return
+
+    start = time.time()
+    rows = detect_drift(sidecars)
+    print("\n   ------------------------------------------------------------------------")
+    print("   | 지역 | 지수  | 회차 |  날짜  |  상태        | Wasserstein |   KS   | 중앙값 이동 |")
+    print("   ------------------------------------------------------------------------")
+    for row in rows:
+        if row['wasserstein'] is None:
+            print(f"   | {row['region']:<4} | {row['index']:<5} | {row['session']:>4} | {row['date']:>6} | {row['status']:<12} |"
+                  f"      -      |    -   |      -      |")
+        else:
+            mark = '⚠️' if row['status'] == 'drift' else '  '
+            print(f"   | {row['region']:<4} | {row['index']:<5} | {row['session']:>4} | {row['date']:>6} | {mark}{row['status']:<10} |"
+                  f" {row['wasserstein']:>11.4f} | {row['ks']:>6.3f} | {row['median_shift']:>+11.4f} |")
+    print("   ------------------------------------------------------------------------")
+    print(f"   (비교 계산 {time.time() - start:.2f}초)")
+
+    flags = save_drift_report(rows, source)
+    print(f"\n[성공] 보고서 저장: {DRIFT_REPORT_FILE}")
+    print(f"[성공] 드리프트 의심 {len(flags)}건 저장: {DRIFT_FLAGS_FILE} (pre_2의 DRIFT_FLAGS_FILE로 지정하면 경고/제외)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,88 +1,280 @@
 # -*- coding: utf-8 -*-
 import os
 import glob
+import json
+import math
+import numpy as np
 import rasterio
-from rasterio.warp import calculate_default_transform, reproject, Resampling
+import rasterio.shutil
+from rasterio.warp import calculate_default_transform, Resampling
 from rasterio.crs import CRS
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import shutil
 
 # --- 1. 사용자 설정 부분 ---
+# ※ 구역 통계만 필요하다면 pre_2 의 VIRTUAL_REPROJECTION 을 사용하세요. (재투영 사본 없이 필지 범위만 즉석 변환)
 INPUT_RASTER_FOLDER = '../data/생육데이터/화성'  ## 원본 데이터 저장 폴더
 OUTPUT_RASTER_FOLDER = '../data/생육데이터/화성/hs_data_reprojected_5179'  ## 변환된 데이터 저장 폴더
 
 TARGET_CRS_STRING = 'EPSG:5179'  ## 변환원하는 자표계
 
+NUM_WORKERS = os.cpu_count() or 1  ## 병렬 처리 프로세스 수 (1이면 순차 처리)
+MANIFEST_FILENAME = '_reproject_manifest.json'  ## 출력 폴더에 남기는 처리 이력 (재실행 시 건너뛰기용)
+
+# [스트리밍 모드] 블록 단위로 재투영하여 메모리 사용량을 고정하고, 결과를 COG(타일+압축+오버뷰)로 저장
+STREAMING_MODE = True
+MEMORY_BUDGET_MB = 256  ## 한 번에 읽고 쓰는 블록의 최대 메모리 (파일 크기와 무관)
+BLOCK_SIZE = 512  ## 출력 타일 크기 (px)
+COMPRESSION = 'DEFLATE'
+
+# 좌표 변환 근사 허용 오차 (입력 픽셀 단위). GDAL 기본값(0.125)은 읽는 영역마다 근사가 달라져
+# 블록 단위 결과가 전체 변환과 어긋나므로, 두 모드 모두 사실상 정확한 변환을 사용
+# (transform을 지정한 WarpedVRT는 0을 받지 못해 아주 작은 값으로 지정)
+WARP_TOLERANCE = 1e-9
 
 # -------------------------
 
-def main():
-    """메인 실행 함수"""
+def load_manifest(manifest_path):
+    """이전 실행의 처리 이력을 읽어옵니다. 없거나 깨졌으면 빈 이력으로 시작합니다."""
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"[경고] 처리 이력 파일을 읽을 수 없어 새로 작성합니다: {manifest_path}")
+        return {}
+
+
+def save_manifest(manifest_path, manifest):
+    """처리 이력을 임시 파일에 쓴 뒤 교체하여, 중단되어도 이력이 깨지지 않게 합니다."""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def source_signature(raster_path, target_crs_string):
+    """원본 파일의 크기/수정시각과 목표 CRS로 처리 여부를 판단할 서명을 만듭니다."""
+    stat = os.stat(raster_path)
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'target_crs': target_crs_string,
+        'format': 'COG' if STREAMING_MODE else 'GTiff',
+    }
+
+
+def is_up_to_date(entry, signature):
+    """이력의 서명이 현재 원본과 같고, 변환 결과 파일도 남아 있으면 True"""
+    if not entry:
+        return False
+    if any(entry.get(key) != value for key, value in signature.items()):
+        return False
+    output_path = entry.get('output')
+    return output_path is None or os.path.exists(output_path)
+
+
+def is_same_crs(source_crs, target_crs):
+    """
+    두 CRS가 같은지 권위 코드(예: ('EPSG', '5179'))로 비교합니다.
+    WKT 문자열 검색은 '5179'가 다른 숫자(TOWGS84 파라미터 등)에 섞여 있어도 참이 되므로 사용하지 않습니다.
+    """
+    if source_crs is None:
+        return False
+    source_auth = source_crs.to_authority()
+    target_auth = target_crs.to_authority()
+    if source_auth and target_auth:
+        return source_auth == target_auth
+    # 권위 코드를 찾을 수 없는 사용자 정의 CRS는 정의 자체를 비교
+    return source_crs == target_crs
+
+
+def iter_block_windows(width, height, bytes_per_pixel):
+    """메모리 예산 안에 들어오는 정사각 블록(BLOCK_SIZE의 배수) 단위로 출력 영역을 나눕니다."""
+    budget_bytes = MEMORY_BUDGET_MB * 1024 * 1024
+    side = int(math.sqrt(budget_bytes / bytes_per_pixel))
+    side = max(BLOCK_SIZE, side // BLOCK_SIZE * BLOCK_SIZE)
+
+    for row_off in range(0, height, side):
+        for col_off in range(0, width, side):
+            yield Window(col_off, row_off, min(side, width - col_off), min(side, height - row_off))
+
+
+def reproject_streaming(src, output_path, dst_crs, transform, width, height):
+    """
+    WarpedVRT로 블록마다 필요한 원본 영역만 읽어 재투영하고, COG로 저장합니다.
+    - 1단계: 타일/압축 GeoTIFF 임시 파일에 블록 단위로 기록
+    - 2단계: GDAL COG 드라이버로 복사하면서 내부 오버뷰 생성
+    """
+    tmp_path = output_path + '.part'
+    profile = {
+        'driver': 'GTiff',
+        'dtype': src.dtypes[0],
+        'count': src.count,
+        'nodata': src.nodata,
+        'crs': dst_crs,
+        'transform': transform,
+        'width': width,
+        'height': height,
+        'tiled': True,
+        'blockxsize': BLOCK_SIZE,
+        'blockysize': BLOCK_SIZE,
+        'compress': COMPRESSION,
+        'BIGTIFF': 'IF_SAFER',
+    }
+    bytes_per_pixel = src.count * np.dtype(src.dtypes[0]).itemsize
+
+    try:
+        with WarpedVRT(src, crs=dst_crs, transform=transform, width=width, height=height,
+                       resampling=Resampling.nearest, tolerance=WARP_TOLERANCE,
+                       warp_mem_limit=MEMORY_BUDGET_MB) as vrt, \
+                rasterio.open(tmp_path, 'w', **profile) as dst:
+            for window in iter_block_windows(width, height, bytes_per_pixel):
+                dst.write(vrt.read(window=window), window=window)
+
+        rasterio.shutil.copy(
+            tmp_path, output_path, driver='COG',
+            COMPRESS=COMPRESSION, PREDICTOR='YES', BLOCKSIZE=BLOCK_SIZE,
+            OVERVIEWS='AUTO', OVERVIEW_RESAMPLING='NEAREST', BIGTIFF='IF_SAFER')
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def reproject_raster(raster_path, output_folder, target_crs_string):
+    """단일 래스터 파일을 목표 CRS로 변환합니다. (프로세스 풀에서 호출됨)"""
+    filename = os.path.basename(raster_path)
+    output_path = os.path.join(output_folder, filename)
+
+    target_crs_object = CRS.from_string(target_crs_string)
+
+    with rasterio.open(raster_path) as src:
+        source_crs = src.crs
+        is_target_crs = is_same_crs(source_crs, target_crs_object)
+
+        if is_target_crs:
+            # shutil.copy(raster_path, output_path)
+            return {'file': filename, 'status': 'same_crs', 'output': None}
+
+        transform, width, height = calculate_default_transform(
+            source_crs, target_crs_object, src.width, src.height, *src.bounds)
+
+        if STREAMING_MODE:
+            reproject_streaming(src, output_path, target_crs_object, transform, width, height)
+            return {'file': filename, 'status': 'reprojected', 'output': output_path}
+
+        kwargs = src.meta.copy()
+        kwargs.update({
+            'crs': target_crs_object,
+            'transform': transform,
+            'width': width,
+            'height': height
+        })
+
+        with WarpedVRT(src, crs=target_crs_object, transform=transform, width=width, height=height,
+                       resampling=Resampling.nearest, tolerance=WARP_TOLERANCE) as vrt, \
+                rasterio.open(output_path, 'w', **kwargs) as dst:
+            for i in range(1, src.count + 1):
+                dst.write(vrt.read(i), i)
+
+    return {'file': filename, 'status': 'reprojected', 'output': output_path}
+
+
+def report_result(result):
+    """처리 결과 한 건을 출력합니다."""
+    if result['status'] == 'reprojected':
+        print(f"   [성공] 변환된 파일 저장 완료: {result['file']}")
+    elif result['status'] == 'same_crs':
+        print(f"   [통과] 좌표계가 이미 올바릅니다. 파일을 건너뜁니다: {result['file']}")
+
+
+def main(input_folder=INPUT_RASTER_FOLDER, output_folder=OUTPUT_RASTER_FOLDER,
+         target_crs_string=TARGET_CRS_STRING, num_workers=NUM_WORKERS, executor=None):
+    """
+    메인 실행 함수
+    executor: 여러 지역이 함께 쓰는 프로세스 풀 (run_all_regions.py). 없으면 num_workers 만큼 새로 만듭니다.
+    """
     print("래스터 좌표계 변환 스크립트 실행 시작...")
 
-    if not os.path.exists(OUTPUT_RASTER_FOLDER):
-        os.makedirs(OUTPUT_RASTER_FOLDER)
-        print(f"출력 폴더 생성: {OUTPUT_RASTER_FOLDER}")
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+        print(f"출력 폴더 생성: {output_folder}")
 
-    raster_files = glob.glob(os.path.join(INPUT_RASTER_FOLDER, '*.tif'))
+    raster_files = sorted(glob.glob(os.path.join(input_folder, '*.tif')))
 
     if not raster_files:
-        print(f"[오류] 입력 폴더에 TIF 파일이 없습니다: {INPUT_RASTER_FOLDER}")
+        print(f"[오류] 입력 폴더에 TIF 파일이 없습니다: {input_folder}")
         return
 
     print(f"\n총 {len(raster_files)}개의 파일을 확인합니다.")
 
-    # 목표 CRS의 코드(숫자) 부분만 문자열로 추출
-    target_epsg_code_str = TARGET_CRS_STRING.split(':')[-1]
-
+    # 처리 이력 확인: 이미 최신 상태인 파일은 건너뜀
+    manifest_file = os.path.join(output_folder, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_file)
+    pending = []
+    signatures = {}
     for raster_path in raster_files:
-        filename = os.path.basename(raster_path)
-        output_path = os.path.join(OUTPUT_RASTER_FOLDER, filename)
-
-        with rasterio.open(raster_path) as src:
-            source_crs = src.crs
-            is_target_crs = False
-
-            # === ★★★ 최종 수정된 부분: 단순하고 강력한 문자열 검색 ★★★ ===
-            if source_crs:
-                source_wkt = source_crs.to_wkt()
-                # WKT 문자열 안에 'EPSG'와 목표 코드('5179')가 모두 있는지 확인
-                if 'EPSG' in source_wkt and target_epsg_code_str in source_wkt:
-                    is_target_crs = True
-
-            print(f"-> 확인 중: {filename} (목표 CRS와 동일한가? {is_target_crs})")
-
-            if not is_target_crs:
-                print(f"   [변환 필요] 좌표계를 {TARGET_CRS_STRING}로 재투영합니다...")
-
-                target_crs_object = CRS.from_string(TARGET_CRS_STRING)
-                transform, width, height = calculate_default_transform(
-                    source_crs, target_crs_object, src.width, src.height, *src.bounds)
-
-                kwargs = src.meta.copy()
-                kwargs.update({
-                    'crs': target_crs_object,
-                    'transform': transform,
-                    'width': width,
-                    'height': height
-                })
-
-                with rasterio.open(output_path, 'w', **kwargs) as dst:
-                    for i in range(1, src.count + 1):
-                        reproject(
-                            source=rasterio.band(src, i),
-                            destination=rasterio.band(dst, i),
-                            src_transform=src.transform,
-                            src_crs=src.crs,
-                            dst_transform=transform,
-                            dst_crs=target_crs_object,
-                            resampling=Resampling.nearest)
-                print(f"   [성공] 변환된 파일 저장 완료: {filename}")
-            else:
-                print("   [통과] 좌표계가 이미 올바릅니다. 파일을 건너뜁니다.")
-                # shutil.copy(raster_path, output_path)
+        key = os.path.abspath(raster_path)
+        signatures[key] = source_signature(raster_path, target_crs_string)
+        if is_up_to_date(manifest.get(key), signatures[key]):
+            continue
+        pending.append(raster_path)
+
+    skipped = len(raster_files) - len(pending)
+    if skipped:
+        print(f"   [이력] 이전 실행에서 처리된 {skipped}개 파일은 건너뜁니다.")
+    if not pending:
+        print("\n--- 새로 처리할 파일이 없습니다. ---")
+        return
+
+    print(f"   -> {len(pending)}개 파일 처리")
+
+    def record(raster_path, result):
+        key = os.path.abspath(raster_path)
+        manifest[key] = dict(signatures[key], output=result['output'])
+        save_manifest(manifest_file, manifest)
+        report_result(result)
+
+    # 큰 파일부터 배분하여 프로세스 간 부하를 고르게 함
+    pending.sort(key=os.path.getsize, reverse=True)
+
+    def run_on(pool):
+        futures = {
+            pool.submit(reproject_raster, raster_path, output_folder, target_crs_string): raster_path
+            for raster_path in pending
+        }
+        errors = 0
+        for future in as_completed(futures):
+            raster_path = futures[future]
+            try:
+                record(raster_path, future.result())
+            except Exception as e:
+                errors += 1
+                print(f"   [오류] {os.path.basename(raster_path)}: {e}")
+        return errors
+
+    failed = 0
+    if executor is not None:
+        failed = run_on(executor)
+    elif num_workers <= 1:
+        for raster_path in pending:
+            print(f"-> 확인 중: {os.path.basename(raster_path)}")
+            try:
+                record(raster_path, reproject_raster(raster_path, output_folder, target_crs_string))
+            except Exception as e:
+                failed += 1
+                print(f"   [오류] {os.path.basename(raster_path)}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as own_executor:
+            failed = run_on(own_executor)
 
+    if failed:
+        print(f"\n[경고] {failed}개 파일 처리에 실패했습니다. 다시 실행하면 실패한 파일만 재시도합니다.")
     print("\n--- 모든 래스터 파일 처리가 완료되었습니다. ---")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
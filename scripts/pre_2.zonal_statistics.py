@@ -2,11 +2,23 @@ import os
 import glob
 import geopandas as gpd
 import pandas as pd
+import math
 import rasterio
+from rasterio import features
+from rasterio.crs import CRS
+from rasterio.transform import Affine
+from rasterio.windows import Window, from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import calculate_default_transform, Resampling
 from rasterstats import zonal_stats
 import numpy as np
 import numpy.ma as ma
+import shapely
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
 import re
+import json
+import hashlib
 
 # ==========================================
 # [설정] 경로를 수정해주세요
@@ -15,45 +27,401 @@ GEOJSON_FOLDER = '../geo_data/화성'
 TIF_FOLDER = '../data/생육데이터/화성'
 OUTPUT_FOLDER = 'output'
 OUTPUT_FILE = os.path.join(OUTPUT_FOLDER, 'hs_final_matched.csv')
+# 통계 전체를 {회차}_{지수}_{통계} 컬럼으로 담은 상세 파일 (OUTPUT_FILE에는 기존처럼 {회차}_{지수} = 평균만 저장)
+OUTPUT_DETAIL_FILE = os.path.join(OUTPUT_FOLDER, 'hs_final_matched_stats.csv')
 
 # [필터링] 분석할 식생지수 (대소문자 무시)
 TARGET_INDICES = ['NDVI', 'GNDVI', 'NDRE', 'OSAVI', 'LCI']
 
+# [구역 통계 항목] 'mean', 'median', 'std', 'pNN'(백분위수, 예: p10), 'count'(유효 픽셀 수), 'valid_frac'(유효 픽셀 비율)
+ZONAL_STATS = ['mean', 'median', 'std', 'p10', 'p90', 'count', 'valid_frac']
+# 유효 픽셀 비율이 이 값보다 낮은 셀(대부분 흙/물로 마스킹된 셀)은 OUTPUT_FILE의 평균을 비움 (None이면 사용 안 함)
+MIN_VALID_FRACTION = None
+
+# [필지 매칭] TIF 파일명 접두어 -> GeoJSON sample_code 접두어 변환 규칙 (예: 'GJR1' -> 'GJ-R1')
+PARCEL_PREFIX_MAP = {
+    'GJR': 'GJ-R',  # 김제
+    'HSR': 'HS-R',  # 화성
+}
+SAMPLE_CODE_COLUMN = 'sample_code'
+# sample_code에서 필지 ID를 뽑는 정규식 (예: 'GJ-R1-01' -> 'GJ-R1', 마지막 '-번호'는 격자 셀 번호)
+PARCEL_ID_PATTERN = r'^(.*?)-\d+$'
+
+# [결과 캐시] TIF(경로/크기/수정시각) + GeoJSON + 통계 설정이 같으면 이전 결과를 재사용, 쓰이지 않은 항목은 삭제
+USE_CACHE = True
+CACHE_FOLDER_NAME = 'zonal_cache'  ## OUTPUT_FOLDER/zonal_cache/{결과 파일명}/ 에 저장
+
+# [병렬 처리] (필지, 회차) 작업을 나눠 처리할 프로세스 수 (1이면 순차 처리)
+NUM_WORKERS = os.cpu_count() or 1
+
+# [가상 재투영] 좌표계가 다른 TIF는 재투영 사본(pre_1) 대신, GeoJSON 좌표계로 필지 범위만 즉석 변환하여 읽음
+VIRTUAL_REPROJECTION = True
+# 좌표 변환 근사 허용 오차 (입력 픽셀 단위). GDAL 기본값(0.125)은 읽는 영역마다 근사가 달라져
+# 블록 단위 결과가 전체 변환과 어긋나므로, 필지 범위만 읽어도 pre_1과 같은 픽셀이 되도록 사실상 정확한 변환을 사용
+# (transform을 지정한 WarpedVRT는 0을 받지 못해 아주 작은 값으로 지정)
+WARP_TOLERANCE = 1e-9
+
+# [통계 엔진] 'label': 격자(transform+shape+CRS)마다 구역을 한 번만 래스터화해 두고 bincount로 집계
+#             'exact': 격자마다 구역 × 픽셀 면적비율(0~1) 희소 행렬을 만들어 두고, 가중 평균을 행렬-벡터 곱 한 번으로 계산
+#                      (all_touched는 셀 가장자리에 살짝 걸친 픽셀도 1개로 세므로 작은 셀의 평균이 치우침)
+#             'rasterstats': 파일마다 rasterstats.zonal_stats로 다시 래스터화 (이전 방식, 비교용)
+ZONAL_ENGINE = 'label'
+
+# [드리프트 검사] basic_scripts/5.drift_detection.py가 만든 드리프트 의심 회차 목록(JSON) (None이면 사용 안 함)
+DRIFT_FLAGS_FILE = None  # 예: '../data/생육데이터/drift_flags.json'
+# 'warn': 의심 회차 TIF도 계산하되 경고 출력, 'skip': 의심 회차 TIF는 구역 통계에서 제외 (결과 컬럼이 비게 됨)
+DRIFT_ACTION = 'warn'
 
-# ==========================================
-
-def step1_smart_matching_stats():
-    print("\n🚀 [Step 1] 필지별 스마트 매칭 구역 통계 시작")
-    print("   (TIF 파일명 'GJR1' <-> GeoJSON 'GJ-R1' 자동 매핑)")
-
-    if not os.path.exists(OUTPUT_FOLDER):
-        os.makedirs(OUTPUT_FOLDER)
-
-    # 1. GeoJSON 파일 찾기 (하나만 있다고 가정하거나 첫번째 것 사용)
-    geojson_files = glob.glob(os.path.join(GEOJSON_FOLDER, '*.geojson'))
-    if not geojson_files:
-        print("❌ 오류: GeoJSON 파일이 없습니다.")
-        return
-
-    geo_path = geojson_files[0]  # 첫 번째 파일 사용
-    print(f"\n📄 기준 GeoJSON 로드: {os.path.basename(geo_path)}")
-
-    # GeoJSON 로드 및 인덱스 설정 (나중에 값 업데이트를 위해 중요)
-    gdf_master = gpd.read_file(geo_path)
-
-    # 결과 저장을 위한 DataFrame 복사 (Geometry 제외)
-    df_result = pd.DataFrame(gdf_master.drop(columns='geometry'))
 
-    # 2. TIF 파일 목록 가져오기
-    tif_files = glob.glob(os.path.join(TIF_FOLDER, '*.tif'))
-    if not tif_files:
-        print("❌ 오류: TIF 파일이 없습니다.")
-        return
-
-    print(f"   -> 총 {len(tif_files)}개의 TIF 파일을 분석합니다.\n")
+# ==========================================
 
-    # 3. TIF 파일별 반복 처리
-    for tif_path in tif_files:
+def is_same_crs(crs_a, crs_b):
+    """두 CRS를 권위 코드(예: EPSG:5179)로 비교합니다. (WKT 부분 문자열 검색 대신)"""
+    if crs_a is None or crs_b is None:
+        return False
+    crs_a, crs_b = CRS.from_user_input(crs_a), CRS.from_user_input(crs_b)
+    auth_a, auth_b = crs_a.to_authority(), crs_b.to_authority()
+    if auth_a and auth_b:
+        return auth_a == auth_b
+    return crs_a == crs_b
+
+
+def open_clipped_vrt(src, dst_crs, bounds):
+    """
+    src를 dst_crs로 즉석 재투영하는 WarpedVRT를 만들되, 범위를 bounds(필지 영역 + 1픽셀)로 한정합니다.
+    격자는 pre_1이 만들 전체 재투영 결과와 같은 원점/해상도에 맞추므로, 두 방식의 픽셀 위치가 일치합니다.
+    """
+    full_transform, _, _ = calculate_default_transform(
+        src.crs, dst_crs, src.width, src.height, *src.bounds)
+    res_x, res_y = full_transform.a, -full_transform.e
+
+    left, bottom, right, top = bounds
+    col_start = math.floor((left - full_transform.c) / res_x) - 1
+    col_stop = math.ceil((right - full_transform.c) / res_x) + 1
+    row_start = math.floor((full_transform.f - top) / res_y) - 1
+    row_stop = math.ceil((full_transform.f - bottom) / res_y) + 1
+
+    transform = Affine(res_x, 0.0, full_transform.c + col_start * res_x,
+                       0.0, -res_y, full_transform.f - row_start * res_y)
+    return WarpedVRT(src, crs=dst_crs, transform=transform,
+                     width=col_stop - col_start, height=row_stop - row_start,
+                     resampling=Resampling.nearest, tolerance=WARP_TOLERANCE)
+
+
+def read_bounds_window(src, bounds):
+    """
+    대상 geometry들의 합집합 범위(bounds)를 덮는 창만 읽습니다.
+    all_touched=True 로 걸치는 경계 픽셀을 놓치지 않도록 사방 1픽셀 여유를 두고, 래스터 범위로 자릅니다.
+    범위가 래스터와 겹치지 않으면 (None, None)을 반환합니다.
+    """
+    window = from_bounds(*bounds, transform=src.transform)
+    col_start = max(math.floor(window.col_off) - 1, 0)
+    row_start = max(math.floor(window.row_off) - 1, 0)
+    col_stop = min(math.ceil(window.col_off + window.width) + 1, src.width)
+    row_stop = min(math.ceil(window.row_off + window.height) + 1, src.height)
+    if col_stop <= col_start or row_stop <= row_start:
+        return None, None
+
+    window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    return src.read(1, window=window), src.window_transform(window)
+
+
+def geometry_window(geom, transform, shape):
+    """geometry의 bounds를 덮는 격자 범위(rasterstats와 같은 floor~ceil)를 래스터 크기로 잘라 반환합니다."""
+    height, width = shape
+    min_x, min_y, max_x, max_y = geom.bounds
+    row_start = max(math.floor((max_y - transform.f) / transform.e), 0)
+    row_stop = min(math.ceil((min_y - transform.f) / transform.e), height)
+    col_start = max(math.floor((min_x - transform.c) / transform.a), 0)
+    col_stop = min(math.ceil((max_x - transform.c) / transform.a), width)
+    if row_stop <= row_start or col_stop <= col_start:
+        return None
+    return row_start, row_stop, col_start, col_stop
+
+
+def build_zone_index(geometries, transform, shape, all_touched=True):
+    """
+    구역(geometry)들을 격자(transform, shape)에 한 번만 래스터화하여 (구역 번호, 픽셀 번호) 배열 쌍을 만듭니다.
+    1.3m 격자 셀은 서로 변을 공유하므로 all_touched 경계 픽셀이 두 구역에 동시에 속할 수 있어,
+    구역당 하나의 값만 담는 라벨 배열 대신 (구역, 픽셀) 쌍 목록으로 저장합니다.
+    각 geometry는 rasterstats와 같은 범위(bounds의 floor~ceil 창)에서 래스터화합니다.
+    """
+    width = shape[1]
+    zone_ids, pixel_ids = [], []
+    for zone_id, geom in enumerate(geometries):
+        bounds = geometry_window(geom, transform, shape)
+        if bounds is None:
+            continue
+        row_start, row_stop, col_start, col_stop = bounds
+
+        window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+        inside = features.rasterize(
+            [(geom, 1)],
+            out_shape=(row_stop - row_start, col_stop - col_start),
+            transform=rasterio.windows.transform(window, transform),
+            fill=0,
+            dtype='uint8',
+            all_touched=all_touched,
+        )
+        rows, cols = np.nonzero(inside)
+        pixel_ids.append((rows + row_start) * width + (cols + col_start))
+        zone_ids.append(np.full(rows.size, zone_id, dtype=np.int32))
+
+    if not pixel_ids:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+    return np.concatenate(zone_ids), np.concatenate(pixel_ids)
+
+
+def build_coverage_matrix(geometries, transform, shape):
+    """
+    구역 × 픽셀 희소 행렬(CSR)을 만듭니다. 각 원소는 픽셀 면적 중 구역 polygon이 실제로 덮는 비율(0~1)입니다.
+    픽셀 사각형과 polygon의 교차 면적을 shapely 벡터 연산으로 구역당 한 번에 계산합니다.
+    """
+    height, width = shape
+    pixel_area = abs(transform.a * transform.e)
+    zone_ids, pixel_ids, weights = [], [], []
+    for zone_id, geom in enumerate(geometries):
+        bounds = geometry_window(geom, transform, shape)
+        if bounds is None:
+            continue
+        row_start, row_stop, col_start, col_stop = bounds
+
+        rows, cols = np.mgrid[row_start:row_stop, col_start:col_stop]
+        rows, cols = rows.ravel(), cols.ravel()
+        left = transform.c + cols * transform.a
+        top = transform.f + rows * transform.e
+        pixels = shapely.box(left, top + transform.e, left + transform.a, top)
+        coverage = shapely.area(shapely.intersection(pixels, geom)) / pixel_area
+
+        touched = coverage > 0
+        pixel_ids.append(rows[touched] * width + cols[touched])
+        zone_ids.append(np.full(touched.sum(), zone_id, dtype=np.int32))
+        weights.append(coverage[touched])
+
+    n_zones = len(geometries)
+    if not pixel_ids:
+        return sparse.csr_matrix((n_zones, height * width))
+    return sparse.csr_matrix(
+        (np.concatenate(weights), (np.concatenate(zone_ids), np.concatenate(pixel_ids))),
+        shape=(n_zones, height * width))
+
+
+def active_stats():
+    """계산할 통계 목록. 기본 결과 파일에 필요한 'mean'은 항상 포함합니다."""
+    return ['mean'] + [stat for stat in ZONAL_STATS if stat != 'mean']
+
+
+def percentile_of(stat):
+    """통계 이름을 백분위수(0~100)로 변환합니다. 백분위수 통계가 아니면 None ('median' = p50)"""
+    if stat == 'median':
+        return 50.0
+    match = re.fullmatch(r'p(\d+(?:\.\d+)?)', stat)
+    return float(match.group(1)) if match else None
+
+
+def zonal_statistics(zone_index, data, invalid, n_zones, stats):
+    """
+    미리 만들어 둔 구역 색인으로 요청한 통계를 모두 한 번에 계산합니다. 유효 픽셀이 없는 구역은 NaN.
+    - (구역 번호, 픽셀 번호) 쌍: 모든 픽셀 가중치 1
+    - 면적비율 희소 행렬: 평균/표준편차/유효비율은 면적 가중, 백분위수는 셀에 걸친 픽셀 값 기준
+    평균/표준편차/개수는 bincount 집계로, 중앙값/백분위수는 (구역, 값) 정렬 한 번으로 모든 항목을 구합니다.
+    """
+    if sparse.issparse(zone_index):
+        coo = zone_index.tocoo()
+        zone_ids, pixel_ids, weights = coo.row, coo.col, coo.data
+    else:
+        zone_ids, pixel_ids = zone_index
+        weights = np.ones(zone_ids.size)
+
+    values = data.ravel()[pixel_ids].astype(np.float64)
+    valid = ~invalid.ravel()[pixel_ids] & ~np.isnan(values)
+    total_weight = np.bincount(zone_ids, weights=weights, minlength=n_zones)
+
+    zone_ids, values, weights = zone_ids[valid], values[valid], weights[valid]
+    count = np.bincount(zone_ids, minlength=n_zones)
+    weight_sum = np.bincount(zone_ids, weights=weights, minlength=n_zones)
+    has_data = count > 0
+
+    def per_zone(sums, denominators):
+        out = np.full(n_zones, np.nan)
+        np.divide(sums, denominators, out=out, where=has_data)
+        return out
+
+    mean = per_zone(np.bincount(zone_ids, weights=weights * values, minlength=n_zones), weight_sum)
+    results = {}
+    for stat in stats:
+        if stat == 'mean':
+            results[stat] = mean
+        elif stat == 'std':
+            deviation = values - mean[zone_ids]
+            variance = per_zone(np.bincount(zone_ids, weights=weights * deviation ** 2, minlength=n_zones),
+                                weight_sum)
+            results[stat] = np.sqrt(variance)
+        elif stat == 'count':
+            results[stat] = count.astype(np.float64)
+        elif stat == 'valid_frac':
+            results[stat] = per_zone(weight_sum, total_weight)
+
+    percentiles = {stat: percentile_of(stat) for stat in stats if percentile_of(stat) is not None}
+    if percentiles:
+        # 구역 -> 값 순으로 한 번 정렬하면 각 구역의 값이 연속 구간에 오름차순으로 놓임
+        order = np.lexsort((values, zone_ids))
+        sorted_values = values[order]
+        starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+        last = np.maximum(count - 1, 0)
+        for stat, q in percentiles.items():
+            # numpy.percentile(linear)과 같은 보간
+            position = last * (q / 100.0)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            fraction = position - lower
+            out = np.full(n_zones, np.nan)
+            lo_values = sorted_values[(starts + lower)[has_data]]
+            hi_values = sorted_values[(starts + upper)[has_data]]
+            out[has_data] = lo_values + (hi_values - lo_values) * fraction[has_data]
+            results[stat] = out
+
+    return results
+
+
+def normalize_parcel_id(parcel_id):
+    """대소문자/구분자/숫자 앞 0 차이를 없앤 비교용 필지 ID (예: 'gj-r01' -> 'GJR1')"""
+    parcel_id = re.sub(r'[^0-9A-Za-z]', '', str(parcel_id)).upper()
+    return re.sub(r'\d+', lambda m: str(int(m.group())), parcel_id)
+
+
+def build_parcel_index(gdf):
+    """GeoJSON을 한 번만 훑어 {정규화된 필지 ID: 행 인덱스 배열} 색인을 만듭니다."""
+    codes = gdf[SAMPLE_CODE_COLUMN].astype(str)
+    parcel_ids = codes.str.extract(PARCEL_ID_PATTERN, expand=False).fillna(codes)
+    keys = parcel_ids.map(normalize_parcel_id)
+    return {key: gdf.index[positions] for key, positions in keys.groupby(keys).indices.items()}
+
+
+def tif_parcel_id(parcel_id_tif):
+    """TIF 파일명의 필지 ID에 접두어 변환 규칙을 적용합니다. (예: 'GJR1' -> 'GJ-R1')"""
+    match = re.match(r"([a-zA-Z]+)(\d+)", parcel_id_tif)
+    if not match:
+        # 패턴 매칭 실패 시 파일명 그대로 사용
+        return parcel_id_tif
+    prefix, number = match.groups()
+    return f"{PARCEL_PREFIX_MAP.get(prefix.upper(), prefix)}{number}"
+
+
+def extract_tif_values(tif_path, target_gdf, zone_cache):
+    """
+    TIF 하나에서 target_gdf 각 행의 구역 통계를 계산합니다. {통계 이름: target_gdf 행 순서와 같은 배열}
+    대상이 래스터 범위 밖이면 None을 반환합니다.
+    """
+    with rasterio.open(tif_path) as src:
+        if VIRTUAL_REPROJECTION and not is_same_crs(src.crs, target_gdf.crs):
+            # 필지 범위만 GeoJSON 좌표계로 즉석 재투영하여 읽기 (디스크 사본 없음)
+            dst_crs = CRS.from_user_input(target_gdf.crs)
+            with open_clipped_vrt(src, dst_crs, target_gdf.total_bounds) as vrt:
+                data = vrt.read(1)
+                affine = vrt.transform
+        else:
+            # 좌표계 매칭
+            if not is_same_crs(target_gdf.crs, src.crs):
+                target_gdf = target_gdf.to_crs(src.crs)
+
+            # 대상 포인트 범위의 창만 읽기 (전체 정사영상 X)
+            data, affine = read_bounds_window(src, target_gdf.total_bounds)
+            if data is None:
+                return None
+
+    # 마스킹: NoData, 0, 비정상 범위 제거
+    mask_condition = (data < -5) | (data > 5) | (data == 0)
+
+    if ZONAL_ENGINE in ('label', 'exact'):
+        # 같은 격자의 다른 지수(NDVI, GNDVI, ...)는 캐시된 래스터화 결과를 재사용
+        grid_key = (tuple(target_gdf.index), tuple(affine)[:6], data.shape,
+                    CRS.from_user_input(target_gdf.crs).to_string())
+        zone_index = zone_cache.get(grid_key)
+        if zone_index is None:
+            if ZONAL_ENGINE == 'exact':
+                zone_index = build_coverage_matrix(target_gdf.geometry.values, affine, data.shape)
+            else:
+                zone_index = build_zone_index(target_gdf.geometry, affine, data.shape)
+            zone_cache[grid_key] = zone_index
+        return zonal_statistics(zone_index, data, mask_condition, len(target_gdf), active_stats())
+
+    # rasterstats는 masked array의 마스크를 무시하므로, 제거할 값을 nodata로 채워서 전달
+    masked_data = ma.masked_where(mask_condition, data, copy=False)
+    rs_names = {stat: f"percentile_{percentile_of(stat):g}" if percentile_of(stat) is not None else stat
+                for stat in active_stats() if stat != 'valid_frac'}
+    rs_stats = set(rs_names.values()) | {'count', 'nodata'}
+    stats = zonal_stats(
+        target_gdf,
+        masked_data.filled(-9999),
+        affine=affine,
+        nodata=-9999,
+        stats=sorted(rs_stats),
+        all_touched=True
+    )
+
+    def column(key):
+        return np.array([np.nan if s[key] is None else s[key] for s in stats], dtype=np.float64)
+
+    results = {stat: column(name) for stat, name in rs_names.items()}
+    if 'valid_frac' in active_stats():
+        count, nodata = column('count'), column('nodata')
+        results['valid_frac'] = np.where(count + nodata > 0, count / np.maximum(count + nodata, 1), np.nan)
+    return results
+
+
+def run_zonal_job(job):
+    """
+    (필지, 회차) 작업 하나의 TIF들을 처리합니다. (프로세스 풀에서 실행됨)
+    같은 작업의 TIF는 격자가 같으므로 래스터화 결과를 작업 안에서 재사용합니다.
+    반환: [(파일 순번, 컬럼명, {통계: 값 배열} 또는 None, 메시지 또는 None), ...]
+    """
+    zone_cache = {}
+    results = []
+    for order, tif_path, col_name in job['tifs']:
+        tif_name = os.path.basename(tif_path)
+        try:
+            values = extract_tif_values(tif_path, job['target_gdf'], zone_cache)
+            if values is None:
+                results.append((order, col_name, None, f"⚠️ 대상 포인트가 래스터 범위 밖에 있습니다: {tif_name}"))
+            else:
+                results.append((order, col_name, values, None))
+        except Exception as e:
+            results.append((order, col_name, None, f"❌ 오류 발생 ({tif_name}): {e}"))
+    return results
+
+
+def load_drift_flags():
+    """DRIFT_FLAGS_FILE에서 드리프트 의심 TIF 목록을 읽습니다. {TIF 파일명: 사유}"""
+    if not DRIFT_FLAGS_FILE:
+        return {}
+    if not os.path.exists(DRIFT_FLAGS_FILE):
+        print(f"⚠️ 드리프트 목록 파일이 없어 검사를 건너뜁니다: {DRIFT_FLAGS_FILE}")
+        return {}
+
+    with open(DRIFT_FLAGS_FILE, 'r', encoding='utf-8') as f:
+        flags = json.load(f)['flags']
+    drift_flags = {}
+    for flag in flags:
+        reason = (f"{flag['index']} {flag['session']}회차 Wasserstein {flag['wasserstein']:.3f}, "
+                  f"KS {flag['ks']:.2f}, 중앙값 이동 {flag['median_shift']:+.3f}")
+        for raster in flag['rasters']:
+            drift_flags[raster] = reason
+    print(f"📄 드리프트 의심 TIF {len(drift_flags)}개 로드 (처리 방식: {DRIFT_ACTION})")
+    return drift_flags
+
+
+def plan_zonal_jobs(tif_files, gdf_master, parcel_index, drift_flags=None):
+    """
+    TIF 파일명을 파싱/매칭하여 (필지, 회차) 단위 작업 목록을 만듭니다.
+    같은 필지·회차의 지수 TIF(NDVI, GNDVI, ...)는 같은 격자이므로 한 작업으로 묶습니다.
+    drift_flags에 있는 TIF는 DRIFT_ACTION에 따라 경고하거나 제외합니다.
+    반환: (작업 목록, 드리프트로 제외한 TIF 경로 목록)
+    """
+    drift_flags = drift_flags or {}
+    jobs = {}
+    drift_skipped = []
+    for order, tif_path in enumerate(tif_files):
         tif_name = os.path.basename(tif_path)
         tif_name_no_ext = os.path.splitext(tif_name)[0]
 
@@ -73,95 +441,262 @@ def step1_smart_matching_stats():
         if not index_name:
             continue  # 대상 지수가 아니면 스킵
 
+        drift_reason = drift_flags.get(tif_name)
+        if drift_reason:
+            if DRIFT_ACTION == 'skip':
+                print(f"⚠️ 스킵: 드리프트 의심 회차 ({tif_name}: {drift_reason})")
+                drift_skipped.append(tif_path)
+                continue
+            print(f"⚠️ 드리프트 의심 회차: {tif_name} ({drift_reason})")
+
         # 컬럼명 생성 (예: 01_NDVI)
         col_name = f"{session}_{index_name.upper()}"
 
         # --- [핵심: 필지 매칭 로직] ---
-        # TIF의 'GJR1'을 GeoJSON의 'GJ-R1' 형태로 변환
-        # 정규표현식으로 영문자(GJR)와 숫자(1)를 분리
-        match = re.match(r"([a-zA-Z]+)(\d+)", parcel_id_tif)
-        if match:
-            prefix = match.group(1)  # GJR
-            number = match.group(2)  # 1
-
-            # 변환 규칙 적용: GJR -> GJ-R
-            if prefix.upper() == 'GJR':
-                target_prefix = 'GJ-R'
-            elif prefix.upper() == 'HSR':  # 화성(HSR)인 경우 대비
-                target_prefix = 'HS-R'
-            else:
-                target_prefix = prefix  # 모르면 그대로
-
-            target_sample_code_start = f"{target_prefix}{number}"  # 예: GJ-R1
-        else:
-            # 패턴 매칭 실패 시 파일명 그대로 검색 시도
-            target_sample_code_start = parcel_id_tif
-
-        # GeoJSON에서 해당 필지에 속하는 포인트만 필터링
-        # sample_code 컬럼에서 'GJ-R1'로 시작하거나 포함된 행 찾기
-        target_indices = gdf_master[gdf_master['sample_code'].str.contains(target_sample_code_start, case=False)].index
+        # TIF의 'GJR1'을 GeoJSON의 'GJ-R1' 형태로 변환한 뒤, 필지 색인에서 정확히 일치하는 행만 조회
+        # (부분 문자열 검색은 'GJ-R1'이 'GJ-R10', 'GJ-R11'까지 잡아내므로 사용하지 않음)
+        target_sample_code_start = tif_parcel_id(parcel_id_tif)
+        parcel_key = normalize_parcel_id(target_sample_code_start)
+        target_indices = parcel_index.get(parcel_key, [])
 
         if len(target_indices) == 0:
             print(f"   pass: {tif_name} (매칭되는 포인트 없음: {target_sample_code_start})")
             continue
 
-        # ---------------------------
-
-        # 해당 컬럼이 결과 DF에 없으면 생성 (NaN으로 초기화)
-        if col_name not in df_result.columns:
-            df_result[col_name] = np.nan
-
         print(f"   📸 처리: {tif_name} -> 대상: {target_sample_code_start} ({len(target_indices)}개 포인트)")
 
-        try:
-            with rasterio.open(tif_path) as src:
-                # 필터링된 포인트들의 Geometry만 가져오기
-                target_gdf = gdf_master.loc[target_indices]
-
-                # 좌표계 매칭
-                if target_gdf.crs != src.crs:
-                    target_gdf = target_gdf.to_crs(src.crs)
-
-                # 데이터 읽기 및 마스킹 (이상한 값 제거)
-                data = src.read(1)
-                affine = src.transform
-
-                # 마스킹: NoData, 0, 비정상 범위 제거
-                mask_condition = (data < -5) | (data > 5) | (data == 0)
-                masked_data = ma.masked_where(mask_condition, data)
-
-                # 구역 통계 추출
-                stats = zonal_stats(
-                    target_gdf,
-                    masked_data,
-                    affine=affine,
-                    stats="mean",
-                    all_touched=True
-                )
-
-                # 추출된 값을 결과 DataFrame의 해당 인덱스에 업데이트
-                # stats 순서와 target_indices 순서는 동일함
-                values = [s['mean'] for s in stats]
-                df_result.loc[target_indices, col_name] = values
+        job = jobs.get((parcel_key, session))
+        if job is None:
+            # 필터링된 포인트들의 Geometry만 작업에 담아 전달
+            job = {'target_gdf': gdf_master.loc[target_indices, ['geometry']], 'tifs': []}
+            jobs[(parcel_key, session)] = job
+        job['tifs'].append((order, tif_path, col_name))
+
+    return list(jobs.values()), drift_skipped
+
+
+def geojson_fingerprint(geo_path):
+    """GeoJSON 내용과 필지 매칭 규칙의 해시. 둘 중 하나라도 바뀌면 모든 캐시가 무효가 됩니다."""
+    digest = hashlib.sha1()
+    with open(geo_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps([PARCEL_PREFIX_MAP, SAMPLE_CODE_COLUMN, PARCEL_ID_PATTERN],
+                             sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def result_cache_key(tif_path, geo_fingerprint):
+    """(TIF 서명, GeoJSON 서명, 통계 설정)으로 만든 캐시 키"""
+    stat = os.stat(tif_path)
+    signature = [os.path.abspath(tif_path), stat.st_size, stat.st_mtime_ns, geo_fingerprint,
+                 ZONAL_ENGINE, VIRTUAL_REPROJECTION, active_stats()]
+    return hashlib.sha1(json.dumps(signature).encode('utf-8')).hexdigest()
+
+
+def load_cached_result(cache_folder, key):
+    """캐시된 {통계: 값 배열}을 읽습니다. 없거나 손상되었으면 None"""
+    path = os.path.join(cache_folder, f"{key}.npz")
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as cached:
+            return {stat: cached[stat] for stat in active_stats()}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_cached_result(cache_folder, key, stats):
+    """결과를 임시 파일에 쓴 뒤 교체하여, 중단되어도 손상된 캐시가 남지 않게 합니다."""
+    path = os.path.join(cache_folder, f"{key}.npz")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **stats)
+    os.replace(tmp_path, path)
+
+
+def evict_stale_cache(cache_folder, used_keys):
+    """이번 실행에서 쓰이지 않은 캐시(바뀌거나 삭제된 TIF, 바뀐 GeoJSON/설정)를 삭제합니다."""
+    removed = 0
+    for path in glob.glob(os.path.join(cache_folder, '*.npz')):
+        if os.path.splitext(os.path.basename(path))[0] not in used_keys:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def merge_zonal_results(df_result, jobs, results):
+    """
+    작업 결과를 파일 순번대로 결과 표에 합칩니다.
+    작업이 끝난 순서와 관계없이 순차 실행과 같은 순서로 기록하므로 결과가 항상 동일합니다.
+    """
+    job_of_order = {}
+    for job in jobs:
+        positions = df_result.index.get_indexer(job['target_gdf'].index)
+        for order, _, _ in job['tifs']:
+            job_of_order[order] = positions
+
+    # 매칭된 컬럼은 값이 없더라도 생성 (NaN으로 초기화), 컬럼명은 {회차}_{지수}_{통계}
+    columns = {}
+    for order, col_name, stats, message in sorted(results, key=lambda r: r[0]):
+        if message:
+            print(f"     {message}")
+        for stat in active_stats():
+            stat_col = f"{col_name}_{stat}"
+            if stat_col not in columns:
+                if stat_col in df_result.columns:
+                    columns[stat_col] = df_result[stat_col].to_numpy(dtype=float, copy=True)
+                else:
+                    columns[stat_col] = np.full(len(df_result), np.nan)
+            if stats is not None:
+                columns[stat_col][job_of_order[order]] = stats[stat]
+
+    df_result = df_result.drop(columns=[c for c in columns if c in df_result.columns])
+    return pd.concat([df_result, pd.DataFrame(columns, index=df_result.index)], axis=1)
+
+
+def mean_only_table(df_detail):
+    """
+    상세 표에서 기존 형식의 표를 만듭니다: {회차}_{지수}_mean -> {회차}_{지수}, 나머지 통계 컬럼은 제외.
+    MIN_VALID_FRACTION이 있으면 유효 픽셀 비율이 낮은 셀의 평균은 비웁니다.
+    """
+    stat_suffixes = tuple(f"_{stat}" for stat in active_stats())
+    stat_cols = [c for c in df_detail.columns if c[0].isdigit() and c.endswith(stat_suffixes)]
+    df_main = df_detail.drop(columns=stat_cols)
+
+    for col in stat_cols:
+        if not col.endswith('_mean'):
+            continue
+        base = col[:-len('_mean')]
+        values = df_detail[col].copy()
+        frac_col = f"{base}_valid_frac"
+        if MIN_VALID_FRACTION is not None and frac_col in df_detail.columns:
+            values[df_detail[frac_col] < MIN_VALID_FRACTION] = np.nan
+        df_main[base] = values
+    return df_main
 
-        except Exception as e:
-            print(f"     ❌ 오류 발생: {e}")
 
-    # 4. 결과 저장 및 정렬
-    # 컬럼 정렬: 기본정보 -> 토양 -> 드론(이름순)
+def order_columns(df):
+    """컬럼 정렬: 기본정보 -> 토양 -> 드론(이름순)"""
     base_cols = ['no', 'soil_code', 'sample_code', 'addr', 'lat', 'lon']
-    existing_base = [c for c in base_cols if c in df_result.columns]
+    existing_base = [c for c in base_cols if c in df.columns]
 
     # 나머지 컬럼들
-    other_cols = [c for c in df_result.columns if c not in existing_base]
+    other_cols = [c for c in df.columns if c not in existing_base]
     drone_cols = sorted([c for c in other_cols if c[0].isdigit()])  # 01_NDVI 등
     soil_cols = [c for c in other_cols if c not in drone_cols]
 
-    final_cols = existing_base + soil_cols + drone_cols
-    df_result = df_result[final_cols]
+    return df[existing_base + soil_cols + drone_cols], drone_cols
+
+
+def job_size(job):
+    """작업의 TIF 용량 합계 (큰 작업부터 배분하여 프로세스 간 부하를 고르게 함)"""
+    return sum(os.path.getsize(tif_path) for _, tif_path, _ in job['tifs'])
+
+
+def step1_smart_matching_stats(geojson_folder=GEOJSON_FOLDER, tif_folder=TIF_FOLDER, output_file=OUTPUT_FILE,
+                               output_detail_file=OUTPUT_DETAIL_FILE, executor=None):
+    """
+    executor: 여러 지역이 함께 쓰는 프로세스 풀 (run_all_regions.py). 없으면 NUM_WORKERS 만큼 새로 만듭니다.
+    """
+    output_folder = os.path.dirname(output_file) or '.'
+    print("\n🚀 [Step 1] 필지별 스마트 매칭 구역 통계 시작")
+    print("   (TIF 파일명 'GJR1' <-> GeoJSON 'GJ-R1' 자동 매핑)")
+
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    # 1. GeoJSON 파일 찾기 (하나만 있다고 가정하거나 첫번째 것 사용)
+    geojson_files = glob.glob(os.path.join(geojson_folder, '*.geojson'))
+    if not geojson_files:
+        print("❌ 오류: GeoJSON 파일이 없습니다.")
+        return
 
-    df_result.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
-    print(f"\n✅ [성공] 매칭 및 병합 완료: {OUTPUT_FILE}")
+    geo_path = geojson_files[0]  # 첫 번째 파일 사용
+    print(f"\n📄 기준 GeoJSON 로드: {os.path.basename(geo_path)}")
+
+    # GeoJSON 로드 및 인덱스 설정 (나중에 값 업데이트를 위해 중요)
+    gdf_master = gpd.read_file(geo_path)
+
+    # 결과 저장을 위한 DataFrame 복사 (Geometry 제외)
+    df_result = pd.DataFrame(gdf_master.drop(columns='geometry'))
+
+    # 필지 ID -> 행 인덱스 색인 (TIF마다 sample_code 전체를 검색하지 않도록 한 번만 생성)
+    parcel_index = build_parcel_index(gdf_master)
+    print(f"   -> 필지 {len(parcel_index)}개 색인 완료")
+
+    # 2. TIF 파일 목록 가져오기 (파일 순번 = 결과 병합 순서)
+    tif_files = sorted(glob.glob(os.path.join(tif_folder, '*.tif')))
+    if not tif_files:
+        print("❌ 오류: TIF 파일이 없습니다.")
+        return
+
+    print(f"   -> 총 {len(tif_files)}개의 TIF 파일을 분석합니다.\n")
+
+    # 3. (필지, 회차) 작업 단위로 처리: 프로세스 풀에서 병렬 실행 후 결과를 순서대로 병합
+    jobs, drift_skipped = plan_zonal_jobs(tif_files, gdf_master, parcel_index, load_drift_flags())
+    results = []
+
+    # 캐시에 있는 TIF는 결과만 읽고, 새로 추가되었거나 바뀐 TIF만 작업에 남김
+    # 결과 파일마다 캐시 폴더를 따로 두어, 다른 지역 실행이 서로의 캐시를 지우지 않게 함
+    cache_folder = os.path.join(output_folder, CACHE_FOLDER_NAME, os.path.splitext(os.path.basename(output_file))[0])
+    cache_keys = {}
+    pending_jobs = jobs
+    if USE_CACHE:
+        os.makedirs(cache_folder, exist_ok=True)
+        geo_fingerprint = geojson_fingerprint(geo_path)
+        pending_jobs = []
+        for job in jobs:
+            pending_tifs = []
+            for order, tif_path, col_name in job['tifs']:
+                cache_keys[order] = result_cache_key(tif_path, geo_fingerprint)
+                cached = load_cached_result(cache_folder, cache_keys[order])
+                if cached is None:
+                    pending_tifs.append((order, tif_path, col_name))
+                else:
+                    results.append((order, col_name, cached, None))
+            if pending_tifs:
+                pending_jobs.append(dict(job, tifs=pending_tifs))
+        print(f"\n   -> 캐시 재사용 {len(results)}개, 새로 계산 {sum(len(j['tifs']) for j in pending_jobs)}개")
+
+    # 큰 작업부터 배분 (병합은 파일 순번 기준이므로 결과 순서와 무관)
+    pending_jobs.sort(key=job_size, reverse=True)
+    computed = []
+    if executor is not None:
+        for job_results in executor.map(run_zonal_job, pending_jobs):
+            computed.extend(job_results)
+    elif NUM_WORKERS <= 1 or len(pending_jobs) <= 1:
+        for job in pending_jobs:
+            computed.extend(run_zonal_job(job))
+    else:
+        print(f"\n   -> {len(pending_jobs)}개 작업을 프로세스 {NUM_WORKERS}개로 처리합니다.")
+        with ProcessPoolExecutor(max_workers=NUM_WORKERS) as own_executor:
+            for job_results in own_executor.map(run_zonal_job, pending_jobs):
+                computed.extend(job_results)
+    results.extend(computed)
+
+    if USE_CACHE:
+        for order, _, stats, _ in computed:
+            if stats is not None:
+                save_cached_result(cache_folder, cache_keys[order], stats)
+        # 드리프트로 이번에만 제외한 TIF의 캐시는 남겨 두어, 제외를 풀었을 때 다시 계산하지 않게 함
+        used_keys = set(cache_keys.values())
+        used_keys.update(result_cache_key(tif_path, geo_fingerprint) for tif_path in drift_skipped)
+        removed = evict_stale_cache(cache_folder, used_keys)
+        if removed:
+            print(f"   -> 오래된 캐시 {removed}개 삭제")
+
+    df_detail = merge_zonal_results(df_result, jobs, results)
+
+    # 4. 결과 저장 및 정렬
+    # 상세 파일: 모든 통계 / 기본 파일: 평균만 (pre_3, theme 스크립트가 읽는 기존 형식)
+    df_detail, _ = order_columns(df_detail)
+    df_detail.to_csv(output_detail_file, index=False, encoding='utf-8-sig')
+    print(f"\n✅ [성공] 구역 통계 상세 저장: {output_detail_file} ({', '.join(active_stats())})")
+
+    df_result, drone_cols = order_columns(mean_only_table(df_detail))
+    df_result.to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"✅ [성공] 매칭 및 병합 완료: {output_file}")
 
     # 데이터 확인
     if drone_cols:
@@ -1,11 +1,21 @@
 import pandas as pd
 import numpy as np
 from scipy.interpolate import CubicSpline
+from scipy.linalg import solveh_banded
+import matplotlib
+matplotlib.use('Agg')  # 화면 없이 파일로만 저장 (프로세스 풀 자식 프로세스에서도 동일)
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 import os
 import glob
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import math
+import rasterio
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import Resampling
+from rasterio.windows import Window
 
 # ==========================================
 # [설정] 입력 파일 및 TIF 폴더 경로 (반드시 확인!)
@@ -20,6 +30,41 @@ TIF_FOLDER = '../data/생육데이터/화성'
 OUTPUT_FILE = 'output/hs_time_series_weekly_auto.csv'
 OUTPUT_IMG_DIR = 'output/hs_growth_curves_weekly'
 
+# 4. 일 단위(Daily) 보간 시계열 저장 여부 (포인트 × 지수 × 날짜의 긴 형식 CSV)
+SAVE_DAILY_SERIES = False
+DAILY_OUTPUT_FILE = 'output/hs_time_series_daily.csv'
+
+# 5. 곡선 계수 저장 (pre_4.curve_features.py가 재적합 없이 AUC/기울기/생육 시작·종료일 등을 계산하는 데 사용)
+#    'spline' 외 모델은 일 단위 조각으로 저장되므로 파일이 커질 수 있음
+SAVE_CURVE_COEFFICIENTS = True
+CURVE_COEF_FILE = 'output/hs_curve_coefficients.npz'
+
+# 6. 생육 곡선 모델
+#   'spline'          : 관측점을 그대로 지나는 Natural Cubic Spline (기존 방식, 관측이 적으면 과도한 굴곡/가짜 Peak 가능)
+#   'double_logistic' : 생육(상승)·노화(하강) 두 로지스틱 곡선의 합, 모든 포인트를 한꺼번에 Levenberg-Marquardt로 적합
+#   'whittaker'       : 일 단위 격자에서 2차 차분 벌점으로 평활 (띠 행렬 연립방정식 한 번으로 모든 포인트 계산)
+CURVE_MODEL = 'spline'
+WHITTAKER_LAMBDA = 100  # 클수록 매끈함 (관측값을 덜 따라감)
+DL_PRIOR_WEIGHT = 1e-3  # 관측이 매개변수(6개)보다 적을 때 곡선이 튀지 않도록 초기 추정값 쪽으로 당기는 강도
+DL_ITERATIONS = 40
+
+# 7. 성장 곡선 그래프 저장 ('off': 저장 안 함, 'sample': 일부 포인트만, 'all': 모든 포인트)
+PLOT_MODE = 'off'
+PLOT_SAMPLES = []  # 'sample' 모드에서 그릴 sample_code 목록 (비어 있으면 PLOT_SAMPLE_SIZE개를 고르게 선택)
+PLOT_SAMPLE_SIZE = 20
+PLOT_WORKERS = os.cpu_count() or 1  # 그래프 저장 프로세스 수 (1이면 순차 처리)
+
+# 8. 픽셀 단위 생육 지도 (필지·지수별 회차 래스터를 쌓아 모든 픽셀에 CURVE_MODEL 적용)
+PHENOLOGY_MAPS = False
+PHENOLOGY_OUTPUT_DIR = 'output/hs_phenology_maps'
+PHENOLOGY_MEMORY_MB = 256  # 타일 하나를 계산할 때 쓰는 최대 메모리 (래스터 크기와 무관)
+PHENOLOGY_TILE_SIZE = 256  # 타일 크기의 단위 (px), 메모리 예산 안에서 이 값의 배수로 정함
+PHENOLOGY_WORKERS = os.cpu_count() or 1  # 타일 병렬 처리 프로세스 수 (1이면 순차 처리)
+# 좌표 변환 근사 허용 오차 (입력 픽셀 단위). GDAL 기본값(0.125)은 읽는 영역마다 근사가 달라져
+# 타일마다 정렬 결과가 달라지므로, 타일 크기와 무관하게 pre_1/pre_2와 같은 사실상 정확한 변환을 사용
+# (transform을 지정한 WarpedVRT는 0을 받지 못해 아주 작은 값으로 지정)
+WARP_TOLERANCE = 1e-9
+
 # 분석할 식생지수 목록
 TARGET_INDICES = ['NDVI', 'GNDVI', 'NDRE', 'OSAVI', 'LCI']
 # ==========================================
@@ -74,23 +119,402 @@ def get_session_dates_from_tifs(folder_path):
     return sorted_map
 
 
-def step2_auto_interpolation_final():
-    print("\n🚀 [Step 2] 자동 날짜 매핑 및 주 단위(Weekly) 시계열 분석 시작")
+CURVE_MODEL_LABELS = {'spline': 'Spline', 'double_logistic': 'Double Logistic', 'whittaker': 'Whittaker'}
+
+
+def whittaker_smooth(x_values, y, grid):
+    """
+    Whittaker 평활: 일 단위 격자(grid)에서 (W + λDᵀD) z = W y 를 풀어 관측이 없는 날까지 채운 곡선 z를 구하는 함수
+    - y: (포인트 수, 관측 수), 관측 회차 패턴이 같은 포인트 묶음이므로 왼쪽 행렬은 하나 → 오른쪽 변을 모아 한 번에 풀이
+    - 반환: (포인트 수, len(grid))
+    """
+    n_days = len(grid)
+    obs_pos = np.rint(x_values - grid[0]).astype(int)
+
+    # DᵀD (2차 차분 [1, -2, 1]) 는 대각선 5개짜리 대칭 띠 행렬 → 밀집 행렬 없이 위쪽 띠 형식(solveh_banded)으로 바로 구성
+    # banded[2 - k, j] = (DᵀD)[j - k, j]: 차분 행 i가 열 i..i+2에 주는 기여를 대각선별로 누적
+    stencil = np.array([1.0, -2.0, 1.0])
+    banded = np.zeros((3, n_days))
+    for k in range(3):
+        for a in range(3 - k):
+            banded[2 - k, a + k:n_days - 2 + a + k] += stencil[a] * stencil[a + k]
+    banded *= WHITTAKER_LAMBDA
+    banded[2, obs_pos] += 1.0
+
+    rhs = np.zeros((n_days, y.shape[0]))
+    rhs[obs_pos] = y.T
+    return solveh_banded(banded, rhs).T
+
+
+def double_logistic(t, params, with_jacobian=True):
+    """
+    이중 로지스틱 곡선: base + amp * (σ(k1(t - s1)) + σ(-k2(t - s2)) - 1)
+    - params: (포인트 수, 6) = [base, amp, s1, log k1, s2, log k2], t: (포인트 수, 날짜 수) 또는 (날짜 수,)
+    - 반환: (곡선값, 매개변수별 편미분 (포인트 수, 날짜 수, 6))
+      with_jacobian=False면 곡선값만 반환 (일 단위 격자 평가용, 편미분 배열을 만들지 않음)
+    """
+    base, amp, s1, log_k1, s2, log_k2 = (params[:, i:i + 1] for i in range(6))
+    k1, k2 = np.exp(log_k1), np.exp(log_k2)
+    rise = 1 / (1 + np.exp(-np.clip(k1 * (t - s1), -50, 50)))
+    fall = 1 / (1 + np.exp(np.clip(k2 * (t - s2), -50, 50)))
+    shape = rise + fall - 1
+    if not with_jacobian:
+        return base + amp * shape
+    d_rise = amp * rise * (1 - rise)
+    d_fall = amp * fall * (1 - fall)
+
+    jacobian = np.stack(np.broadcast_arrays(
+        np.ones_like(shape), shape,
+        -d_rise * k1, d_rise * (t - s1) * k1,
+        d_fall * k2, -d_fall * (t - s2) * k2), axis=-1)
+    return base + amp * shape, jacobian
+
+
+def fit_double_logistic(x_values, y):
+    """
+    이중 로지스틱 곡선을 모든 포인트에 한꺼번에 맞추는 함수 (배치 Levenberg-Marquardt)
+    - 포인트마다 6×6 정규방정식을 np.linalg.solve로 동시에 풀고, 비용이 줄어든 포인트만 갱신
+    - 관측이 4~6개뿐이므로 초기 추정값 쪽으로 당기는 약한 벌점(DL_PRIOR_WEIGHT)을 함께 최소화
+    - 반환: (포인트 수, 6) 매개변수
+    """
+    n_points = y.shape[0]
+    peak_pos = np.argmax(y, axis=1)
+    x_peak = x_values[peak_pos]
+    span = x_values[-1] - x_values[0]
+
+    # 초기 추정: 바닥/진폭은 관측 범위, 상승/하강 중심은 첫 관측~최대, 최대~마지막 관측의 중간
+    prior = np.column_stack([
+        y.min(axis=1),
+        y.max(axis=1) - y.min(axis=1),
+        (x_values[0] + x_peak) / 2,
+        np.full(n_points, np.log(8 / span)),
+        (x_peak + x_values[-1]) / 2,
+        np.full(n_points, np.log(8 / span)),
+    ])
+    # 벌점 크기: 바닥/진폭 1, 중심 날짜 30일, log 기울기 1 정도의 차이를 같은 무게로 취급
+    prior_weight = DL_PRIOR_WEIGHT / np.array([1.0, 1.0, 30.0, 1.0, 30.0, 1.0]) ** 2
+
+    def cost_of(params):
+        fitted, jacobian = double_logistic(x_values, params)
+        residual = fitted - y
+        deviation = params - prior
+        return (residual ** 2).sum(axis=1) + (prior_weight * deviation ** 2).sum(axis=1), residual, jacobian
+
+    params = prior.copy()
+    damping = np.full(n_points, 1e-2)
+    cost, residual, jacobian = cost_of(params)
+
+    # 수렴한 포인트(비용이 더 줄지 않음)는 다음 반복부터 제외하고 남은 포인트만 계산
+    active = np.arange(n_points)
+    for _ in range(DL_ITERATIONS):
+        if active.size == 0:
+            break
+        jac = jacobian[active]
+        jac_t = jac.transpose(0, 2, 1)
+        normal = jac_t @ jac + np.diag(prior_weight)
+        gradient = (jac_t @ residual[active][:, :, None])[:, :, 0] + prior_weight * (params[active] - prior[active])
+        diagonal = np.diagonal(normal, axis1=1, axis2=2)
+        lhs = normal + (damping[active, None] * diagonal + 1e-12)[:, :, None] * np.eye(6)
+        step = np.linalg.solve(lhs, -gradient[:, :, None])[:, :, 0]
+
+        candidate = params[active] + step
+        fitted, new_jacobian = double_logistic(x_values, candidate)
+        new_residual = fitted - y[active]
+        new_cost = ((new_residual ** 2).sum(axis=1)
+                    + (prior_weight * (candidate - prior[active]) ** 2).sum(axis=1))
+
+        improved = new_cost < cost[active]
+        converged = improved & (cost[active] - new_cost <= 1e-10 * cost[active])
+        moved = active[improved]
+        params[moved] = candidate[improved]
+        cost[moved] = new_cost[improved]
+        residual[moved] = new_residual[improved]
+        jacobian[moved] = new_jacobian[improved]
+        damping[active] = np.where(improved, damping[active] / 3, damping[active] * 3)
+        active = active[~converged & (damping[active] < 1e8)]
+
+    return params
+
+
+def fit_curve_model(x_values, y, x_start, x_end):
+    """
+    관측 회차 패턴이 같은 포인트 묶음에 CURVE_MODEL 곡선을 맞추는 함수
+    - 반환: 배치 CubicSpline (axis=1). 'spline' 외 모델은 일 단위 곡선값을 Cubic Spline으로 옮겨 담아,
+      Peak/기울기 계산과 평가 방식을 모든 모델에서 동일하게 사용
+    """
+    if CURVE_MODEL == 'spline':
+        return CubicSpline(x_values, y, axis=1, bc_type='natural')
+
+    grid = np.arange(x_start, x_end + 1, dtype=float)
+    if CURVE_MODEL == 'whittaker':
+        daily = whittaker_smooth(x_values, y, grid)
+    elif CURVE_MODEL == 'double_logistic':
+        daily = double_logistic(grid, fit_double_logistic(x_values, y), with_jacobian=False)
+    else:
+        raise ValueError(f"알 수 없는 CURVE_MODEL: {CURVE_MODEL}")
+    return CubicSpline(grid, daily, axis=1, bc_type='natural')
+
+
+def curve_breakpoint_count(n_sessions, x_start, x_end):
+    """CURVE_MODEL이 만드는 CubicSpline의 조각 경계 수: 'spline'은 관측 회차 수, 나머지는 일 단위 격자의 날짜 수"""
+    if CURVE_MODEL == 'spline':
+        return n_sessions
+    return int(x_end - x_start) + 1
+
 
-    if not os.path.exists(OUTPUT_IMG_DIR):
-        os.makedirs(OUTPUT_IMG_DIR)
+def iter_curve_groups(x_values, y_matrix, x_start, x_end):
+    """
+    유효 관측 회차 패턴이 같은 포인트끼리 묶어 생육 곡선(CURVE_MODEL)을 한 번에 맞추는 함수
+    - y_matrix: (포인트 수, 회차 수) 관측값, 결측치는 NaN
+    - (행 번호, 배치 CubicSpline)을 묶음마다 생성. 유효 관측이 3개 미만이거나 적합에 실패한 묶음은 제외
+    """
+    valid = ~np.isnan(y_matrix)
+
+    patterns, group_ids = np.unique(valid, axis=0, return_inverse=True)
+    group_ids = group_ids.reshape(-1)
+    for group_id, pattern in enumerate(patterns):
+        # 결측치 체크 (데이터가 3개 미만이면 곡선 적합 불가)
+        if pattern.sum() < 3:
+            continue
+        rows = np.flatnonzero(group_ids == group_id)
+        try:
+            cs = fit_curve_model(x_values[pattern], y_matrix[np.ix_(rows, pattern)], x_start, x_end)
+        except (ValueError, np.linalg.LinAlgError):
+            continue
+        yield rows, cs
+
+
+def spline_peaks(cs, x_start, x_end):
+    """
+    배치 CubicSpline의 [x_start, x_end] 구간 최댓값과 위치를 도함수의 근으로 직접 구하는 함수
+    - 각 조각의 도함수(2차식) 근과 구간 양 끝점만 후보로 두고 비교하므로, 촘촘한 격자 탐색 없이 정확한 Peak를 얻음
+    - 첫/마지막 조각은 관측 범위 밖(외삽) 구간까지 담당
+    - 반환: (최댓값, 최댓값 위치) 각각 (포인트 수,) 배열
+    """
+    breaks = cs.x
+    c = cs.c  # (4, 조각 수, 포인트 수), 조각 i: c0*t^3 + c1*t^2 + c2*t + c3 (t = x - breaks[i])
+
+    # 조각별 담당 구간을 분석 기간으로 자름
+    piece_lo = np.maximum(np.concatenate([[-np.inf], breaks[1:-1]]), x_start)
+    piece_hi = np.minimum(np.concatenate([breaks[1:-1], [np.inf]]), x_end)
+
+    # 도함수 3*c0*t^2 + 2*c1*t + c2 = 0 의 근 (c0가 0에 가까워도 안정적인 형태)
+    qa, qb, qc = 3 * c[0], 2 * c[1], c[2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = qb * qb - 4 * qa * qc
+        sqrt_disc = np.sqrt(np.where(disc >= 0, disc, np.nan))
+        q = -0.5 * (qb + np.where(qb >= 0, 1.0, -1.0) * sqrt_disc)
+        roots = np.stack([q / qa, qc / q])  # (2, 조각 수, 포인트 수)
+
+    root_x = breaks[:-1][None, :, None] + roots
+    in_piece = (np.isfinite(root_x)
+                & (root_x >= piece_lo[None, :, None]) & (root_x <= piece_hi[None, :, None]))
+    t = np.where(in_piece, roots, 0.0)
+    root_y = np.where(in_piece, ((c[0] * t + c[1]) * t + c[2]) * t + c[3], -np.inf)
+
+    # 후보: 조각별 근 + 분석 기간 양 끝점 → (포인트 수, 후보 수)
+    n_rows = c.shape[2]
+    cand_x = np.concatenate([root_x.reshape(-1, n_rows).T,
+                             np.tile([x_start, x_end], (n_rows, 1))], axis=1)
+    cand_y = np.concatenate([root_y.reshape(-1, n_rows).T, cs([x_start, x_end])], axis=1)
+
+    best = np.argmax(cand_y, axis=1)
+    rows = np.arange(n_rows)
+    return cand_y[rows, best], cand_x[rows, best]
+
+
+def spline_derivative_at(cs, x):
+    """배치 CubicSpline의 1차 도함수를 포인트마다 다른 위치 x (포인트 수,)에서 계산하는 함수"""
+    piece = np.clip(np.searchsorted(cs.x, x, side='right') - 1, 0, len(cs.x) - 2)
+    t = x - cs.x[piece]
+    cols = np.arange(len(x))
+    c0, c1, c2 = cs.c[0, piece, cols], cs.c[1, piece, cols], cs.c[2, piece, cols]
+    return (3 * c0 * t + 2 * c1) * t + c2
+
+
+def spline_max_slope(cs, lo, hi, sign=1):
+    """
+    배치 CubicSpline의 1차 도함수 최댓값(sign=-1이면 최솟값)을 포인트별 구간 [lo, hi]에서 직접 구하는 함수
+    - 도함수는 조각마다 2차식이므로, 구간 양 끝점·조각 경계·조각별 꼭짓점(2차 도함수 = 0)만 비교하면 됨
+    - lo, hi: 스칼라 또는 (포인트 수,) 배열
+    """
+    breaks = cs.x
+    c = cs.c
+    n_rows = c.shape[2]
+    lo = np.broadcast_to(np.asarray(lo, dtype=float), (n_rows,))
+    hi = np.broadcast_to(np.asarray(hi, dtype=float), (n_rows,))
+
+    # 구간 양 끝점
+    candidates = [sign * spline_derivative_at(cs, lo), sign * spline_derivative_at(cs, hi)]
+
+    # 조각 경계
+    inner = breaks[1:-1]
+    in_range = (inner[None, :] >= lo[:, None]) & (inner[None, :] <= hi[:, None])
+    candidates.append(np.where(in_range, sign * cs(inner, 1), -np.inf).max(axis=1))
+
+    # 조각별 꼭짓점 (첫/마지막 조각은 외삽 구간까지 담당)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertex_x = breaks[:-1][:, None] - c[1] / (3 * c[0])
+        vertex_slope = sign * (c[2] - c[1] ** 2 / (3 * c[0]))
+    piece_lo = np.concatenate([[-np.inf], inner])[:, None]
+    piece_hi = np.concatenate([inner, [np.inf]])[:, None]
+    in_piece = (np.isfinite(vertex_x) & (vertex_x >= piece_lo) & (vertex_x <= piece_hi)
+                & (vertex_x >= lo[None, :]) & (vertex_x <= hi[None, :]))
+    candidates.append(np.where(in_piece, vertex_slope, -np.inf).max(axis=0))
+
+    return sign * np.max(candidates, axis=0)
+
+
+def fit_growth_curves(x_values, y_matrix, x_new, x_start, x_end, x_daily=None, keep_coefficients=False):
+    """
+    여러 포인트의 생육 곡선을 한꺼번에 보간하고 Peak를 찾는 함수
+    - 반환: (x_new 보간값, Peak 값, Peak DOY, x_daily 보간값 또는 None, 곡선 계수 또는 None)
+    - 곡선 계수(keep_coefficients): pack_curve_coefficients 형식의 (조각 경계, 조각별 3차식 계수)
+    - 유효 관측이 3개 미만이거나 보간에 실패한 포인트는 모두 NaN
+    """
+    n_points = y_matrix.shape[0]
+    y_new_matrix = np.full((n_points, len(x_new)), np.nan)
+    peak_values = np.full(n_points, np.nan)
+    peak_doys = np.full(n_points, np.nan)
+    y_daily_matrix = None if x_daily is None else np.full((n_points, len(x_daily)), np.nan)
+
+    fitted = []
+    for rows, cs in iter_curve_groups(x_values, y_matrix, x_start, x_end):
+        y_new_matrix[rows] = cs(x_new)
+        peak_values[rows], peak_doys[rows] = spline_peaks(cs, x_start, x_end)
+        if y_daily_matrix is not None:
+            y_daily_matrix[rows] = cs(x_daily)
+        if keep_coefficients:
+            fitted.append((rows, cs))
+
+    coefficients = pack_curve_coefficients(fitted, n_points) if keep_coefficients else None
+    return y_new_matrix, peak_values, peak_doys, y_daily_matrix, coefficients
+
+
+def pack_curve_coefficients(fitted, n_points):
+    """
+    묶음별 배치 CubicSpline을 포인트별 배열로 모으는 함수 (관측 패턴마다 조각 수가 달라 뒤쪽을 NaN으로 채움)
+    - 반환: (조각 경계 (포인트 수, 최대 경계 수), 계수 (포인트 수, 4, 최대 경계 수 - 1))
+      조각 i: c0*t^3 + c1*t^2 + c2*t + c3 (t = x - 경계[i]), 첫/마지막 조각은 경계 밖으로 외삽
+    """
+    n_breaks = max((len(cs.x) for _, cs in fitted), default=2)
+    breaks = np.full((n_points, n_breaks), np.nan)
+    coefs = np.full((n_points, 4, n_breaks - 1), np.nan)
+    for rows, cs in fitted:
+        breaks[rows, :len(cs.x)] = cs.x
+        coefs[rows, :, :len(cs.x) - 1] = cs.c.transpose(2, 0, 1)
+    return breaks, coefs
+
+
+def doy_to_date(base_year, doy):
+    """DOY(소수 가능)를 가장 가까운 날짜로 반올림하여 datetime으로 변환"""
+    return datetime(base_year, 1, 1) + timedelta(days=int(np.floor(doy + 0.5)) - 1)
+
+
+def select_plot_rows(df, success):
+    """PLOT_MODE에 따라 그래프를 저장할 포인트(행 위치)를 고르는 함수"""
+    candidates = np.flatnonzero(success)
+    if PLOT_MODE == 'all':
+        return candidates
+    if PLOT_MODE != 'sample':
+        return candidates[:0]
+    if PLOT_SAMPLES and 'sample_code' in df.columns:
+        return candidates[df['sample_code'].iloc[candidates].isin(PLOT_SAMPLES).to_numpy()]
+    if len(candidates) <= PLOT_SAMPLE_SIZE:
+        return candidates
+    # 실행할 때마다 같은 포인트가 뽑히도록 고른 간격으로 선택
+    return candidates[np.linspace(0, len(candidates) - 1, PLOT_SAMPLE_SIZE).round().astype(int)]
+
+
+def render_growth_curves(curves, x_new, base_year, output_img_dir):
+    """
+    그림 한 장을 만들어 두고, 포인트마다 선/점 데이터와 제목만 바꿔 저장하는 함수 (프로세스 풀에서 호출됨)
+    - curves: 포인트별 {'sample_code', 'index_name', 'x_valid', 'y_valid', 'y_new', 'peak_doy', 'peak_val', 'peak_date'}
+    - pyplot 대신 Figure 객체를 직접 사용하므로 스레드에서 호출해도 안전
+    """
+    fig = Figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+
+    # 관측 데이터 (점) / 보간 데이터 (선) / Peak 지점 (별)
+    observed, = ax.plot([], [], 'o', label='Observed (Monthly)', markersize=8, color='black')
+    spline, = ax.plot(x_new, np.full(len(x_new), np.nan), '-', label=f'Weekly {CURVE_MODEL_LABELS[CURVE_MODEL]}', color='green', alpha=0.7)
+    peak, = ax.plot([], [], 'r*', markersize=15)
+
+    # X축 틱 설정 (14일 간격, 날짜로 표시)
+    xticks_doy = np.arange(x_new[0], x_new[-1], 14)
+    ax.set_xticks(xticks_doy)
+    ax.set_xticklabels([doy_to_date(base_year, d).strftime("%m-%d") for d in xticks_doy], rotation=45)
+    ax.set_xlabel("Date")
+    ax.grid(True, alpha=0.3)
+
+    for i, curve in enumerate(curves):
+        observed.set_data(curve['x_valid'], curve['y_valid'])
+        spline.set_ydata(curve['y_new'])
+        peak.set_data([curve['peak_doy']], [curve['peak_val']])
+        peak.set_label(f"Peak: {curve['peak_date']}")
+
+        # 제목에 Sample Code 표시
+        ax.set_title(f"Growth Curve: {curve['sample_code']} ({curve['index_name']})")
+        ax.set_ylabel(curve['index_name'])
+        ax.legend()
+        ax.relim()
+        ax.autoscale_view()
+        if i == 0:
+            fig.tight_layout()
+
+        # 파일명에 sample_code 포함
+        fig.savefig(os.path.join(output_img_dir, f"{curve['sample_code']}_{curve['index_name']}.png"))
+
+    return len(curves)
+
+
+def save_growth_curve_plots(curves, x_new, base_year, output_img_dir, executor=None):
+    """
+    성장 곡선 그래프를 여러 묶음으로 나누어 프로세스 풀에서 저장하는 함수
+    executor: 여러 지역이 함께 쓰는 프로세스 풀 (run_all_regions.py). 없으면 PLOT_WORKERS 만큼 새로 만듭니다.
+    """
+    if not curves:
+        return 0
+    os.makedirs(output_img_dir, exist_ok=True)
+    print(f"\n🖼️ 성장 곡선 그래프 저장 중... ({len(curves)}개, 모드: {PLOT_MODE})")
+
+    if executor is None and PLOT_WORKERS <= 1:
+        return render_growth_curves(curves, x_new, base_year, output_img_dir)
+
+    # 묶음마다 그림 한 장을 재사용하므로, 프로세스 수보다 조금 많은 묶음으로 나눠 부하만 고르게 함
+    n_chunks = min(len(curves), max(1, PLOT_WORKERS) * 4)
+    chunks = [curves[i::n_chunks] for i in range(n_chunks)]
+
+    def run_on(pool):
+        futures = [pool.submit(render_growth_curves, chunk, x_new, base_year, output_img_dir) for chunk in chunks]
+        return sum(future.result() for future in futures)
+
+    if executor is not None:
+        return run_on(executor)
+    with ProcessPoolExecutor(max_workers=PLOT_WORKERS) as own_executor:
+        return run_on(own_executor)
+
+
+def step2_auto_interpolation_final(input_file=INPUT_FILE, tif_folder=TIF_FOLDER,
+                                   output_file=OUTPUT_FILE, output_img_dir=OUTPUT_IMG_DIR,
+                                   daily_output_file=DAILY_OUTPUT_FILE, coef_output_file=CURVE_COEF_FILE,
+                                   executor=None):
+    """
+    executor: 그래프 저장에 쓸 프로세스 풀 (run_all_regions.py에서 여러 지역이 함께 사용). 없으면 PLOT_WORKERS 만큼 새로 만듭니다.
+    """
+    print("\n🚀 [Step 2] 자동 날짜 매핑 및 주 단위(Weekly) 시계열 분석 시작")
 
     # 1. 날짜 정보 자동 추출
-    SESSION_DATES = get_session_dates_from_tifs(TIF_FOLDER)
+    SESSION_DATES = get_session_dates_from_tifs(tif_folder)
     if not SESSION_DATES:
         return
 
     # 2. 데이터 로드
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ 오류: 입력 파일({INPUT_FILE})이 없습니다.")
+    if not os.path.exists(input_file):
+        print(f"❌ 오류: 입력 파일({input_file})이 없습니다.")
         return
 
-    df = pd.read_csv(INPUT_FILE)
+    df = pd.read_csv(input_file)
     print(f"📄 데이터 로드: {len(df)}개 포인트")
 
     # 3. 날짜 처리 (X축: Day of Year)
@@ -110,6 +534,12 @@ def step2_auto_interpolation_final():
     # 시작일부터 끝일까지 7일 간격으로 생성
     x_new = np.arange(start_doy, end_doy + 1, 7)
 
+    # 일 단위 보간 X축 (SAVE_DAILY_SERIES일 때만 사용)
+    x_daily = np.arange(start_doy, end_doy + 1) if SAVE_DAILY_SERIES else None
+    daily_tables = []
+    plot_curves = []
+    curve_coefficients = {}
+
     print(f"📊 분석 기간: DOY {start_doy} ~ {end_doy} (7일 간격, 총 {len(x_new)}개 포인트)")
 
     # 4. 지수별 보간 및 Peak 찾기
@@ -129,94 +559,260 @@ def step2_auto_interpolation_final():
             print(f"   ⚠️ 데이터 없음 (Skip: {index_name})")
             continue
 
-        peak_values = []
-        peak_dates = []
-
-        count_success = 0
-        for idx, row in df.iterrows():
-            # 데이터 값 가져오기
-            y_values = row[cols].values.astype(float)
-            x_values = np.array([session_doy[c.split('_')[0]] for c in cols])
-
-            # 결측치 체크 (데이터가 3개 미만이면 스플라인 불가)
-            valid_mask = ~np.isnan(y_values)
-            if np.sum(valid_mask) < 3:
-                peak_values.append(np.nan)
-                peak_dates.append(np.nan)
-                continue
-
-            try:
-                # 유효한 데이터만 사용하여 보간
-                x_valid = x_values[valid_mask]
-                y_valid = y_values[valid_mask]
-
-                # Cubic Spline 보간
-                cs = CubicSpline(x_valid, y_valid, bc_type='natural')
-                y_new = cs(x_new)
-
-                # Peak 찾기
-                max_idx = np.argmax(y_new)
-                peak_val = y_new[max_idx]
-                peak_doy = x_new[max_idx]
-
-                # DOY -> 날짜(MM-DD) 변환
-                peak_date_obj = datetime(base_year, 1, 1) + timedelta(days=int(peak_doy) - 1)
-                peak_date_str = peak_date_obj.strftime("%m-%d")
-
-                peak_values.append(peak_val)
-                peak_dates.append(peak_date_str)
-                count_success += 1
-
-                # [시각화] 모든 포인트에 대해 그래프 저장 (제한 해제)
-                if True:
-                    fig, ax = plt.subplots(figsize=(10, 5))
-
-                    # 관측 데이터 (점)
-                    ax.plot(x_valid, y_valid, 'o', label='Observed (Monthly)', markersize=8, color='black')
-                    # 보간 데이터 (선)
-                    ax.plot(x_new, y_new, '-', label='Weekly Spline', color='green', alpha=0.7)
-                    # Peak 지점 (별)
-                    ax.plot(peak_doy, peak_val, 'r*', markersize=15, label=f'Peak: {peak_date_str}')
-
-                    # X축 눈금 날짜로 변환
-                    def doy_to_date_str(doy):
-                        return (datetime(base_year, 1, 1) + timedelta(days=int(doy) - 1)).strftime("%m-%d")
-
-                    # X축 틱 설정 (14일 간격)
-                    xticks_doy = np.arange(x_new[0], x_new[-1], 14)
-                    xticks_labels = [doy_to_date_str(d) for d in xticks_doy]
-
-                    ax.set_xticks(xticks_doy)
-                    ax.set_xticklabels(xticks_labels, rotation=45)
-
-                    # 제목에 Sample Code 표시
-                    sample_code = row.get('sample_code', f'Sample_{idx}')
-                    ax.set_title(f"Growth Curve: {sample_code} ({index_name})")
-                    ax.set_xlabel("Date")
-                    ax.set_ylabel(index_name)
-                    ax.grid(True, alpha=0.3)
-                    ax.legend()
-
-                    plt.tight_layout()
-                    # 파일명에 sample_code 포함
-                    plt.savefig(os.path.join(OUTPUT_IMG_DIR, f"{sample_code}_{index_name}.png"))
-                    plt.close()
-
-            except Exception:
-                peak_values.append(np.nan)
-                peak_dates.append(np.nan)
+        # 포인트 × 회차 관측값 행렬 (결측치 NaN)
+        x_values = np.array([session_doy[c.split('_')[0]] for c in cols])
+        y_matrix = df[cols].to_numpy(dtype=float)
+
+        # 유효 관측 패턴별로 묶어 한 번에 Cubic Spline 보간 + 도함수 근으로 Peak 계산 (분석 기간 내)
+        y_new_matrix, peak_values, peak_doys, y_daily_matrix, coefficients = fit_growth_curves(
+            x_values, y_matrix, x_new, start_doy, end_doy, x_daily, keep_coefficients=SAVE_CURVE_COEFFICIENTS)
+        if coefficients is not None:
+            curve_coefficients[f'{index_name}_breaks'], curve_coefficients[f'{index_name}_coefs'] = coefficients
+        success = ~np.isnan(peak_values)
+        count_success = int(success.sum())
+
+        # DOY -> 날짜(MM-DD) 변환 (가장 가까운 날짜로 반올림)
+        peak_dates = [
+            doy_to_date(base_year, doy).strftime("%m-%d") if ok else np.nan
+            for doy, ok in zip(peak_doys, success)
+        ]
+
+        if y_daily_matrix is not None:
+            sample_codes = df['sample_code'] if 'sample_code' in df.columns else df.index
+            daily_tables.append(pd.DataFrame({
+                'sample_code': np.repeat(np.asarray(sample_codes), len(x_daily)),
+                'index': index_name,
+                'doy': np.tile(x_daily, len(df)),
+                'date': np.tile([doy_to_date(base_year, d).strftime("%m-%d") for d in x_daily], len(df)),
+                'value': y_daily_matrix.reshape(-1),
+            }))
+
+        # [시각화] 그래프는 수치 계산이 모두 끝난 뒤 별도 단계에서 저장 (PLOT_MODE)
+        for pos in select_plot_rows(df, success):
+            valid_mask = ~np.isnan(y_matrix[pos])
+            plot_curves.append({
+                'sample_code': df.iloc[pos].get('sample_code', f'Sample_{df.index[pos]}'),
+                'index_name': index_name,
+                'x_valid': x_values[valid_mask],
+                'y_valid': y_matrix[pos, valid_mask],
+                'y_new': y_new_matrix[pos],
+                'peak_doy': peak_doys[pos],
+                'peak_val': peak_values[pos],
+                'peak_date': peak_dates[pos],
+            })
 
         # 결과 저장: Peak 정보
         df[f'{index_name}_Peak_Val'] = peak_values
         df[f'{index_name}_Peak_Date'] = peak_dates
+        df[f'{index_name}_Peak_DOY'] = np.round(peak_doys, 2)
         print(f"   ✅ 처리 완료: {count_success} / {len(df)} 건")
 
     # 5. 최종 파일 저장
-    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
-    print(f"\n💾 [완료] 결과 저장됨: {OUTPUT_FILE}")
-    print(f"   -> Peak 값(Val)과 날짜(Date) 컬럼이 추가되었습니다.")
-    print(f"   -> 그래프 확인: {OUTPUT_IMG_DIR} (총 {len(df)}개 포인트)")
+    df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"\n💾 [완료] 결과 저장됨: {output_file}")
+    print(f"   -> Peak 값(Val), 날짜(Date), DOY 컬럼이 추가되었습니다.")
+
+    if daily_tables:
+        pd.concat(daily_tables, ignore_index=True).to_csv(daily_output_file, index=False, encoding='utf-8-sig')
+        print(f"💾 일 단위 보간 시계열 저장됨: {daily_output_file}")
+
+    if curve_coefficients:
+        sample_codes = df['sample_code'] if 'sample_code' in df.columns else df.index
+        np.savez_compressed(
+            coef_output_file,
+            sample_code=np.asarray(sample_codes).astype(str),
+            base_year=base_year, start_doy=start_doy, end_doy=end_doy, curve_model=CURVE_MODEL,
+            **curve_coefficients)
+        print(f"💾 곡선 계수 저장됨: {coef_output_file} (pre_4.curve_features.py 입력)")
+
+    # 6. 성장 곡선 그래프 저장 (선택)
+    n_plots = save_growth_curve_plots(plot_curves, x_new, base_year, output_img_dir, executor)
+    if n_plots:
+        print(f"   -> 그래프 확인: {output_img_dir} (총 {n_plots}개)")
+
+
+# ==========================================
+# 픽셀 단위 생육 지도 (Peak DOY / Peak 값 / 생육 속도)
+# ==========================================
+PHENOLOGY_LAYERS = ['peak_doy', 'peak_value', 'greenup_rate']
+
+
+def group_session_rasters(folder_path, session_dates):
+    """
+    TIF 파일을 (필지 접두어, 지수)별로 묶어 회차순 파일 목록을 만드는 함수
+    파일명 형식 예시: GJR1_01_250619_GNDVI.tif -> ('GJR1', 'GNDVI'): [('01', 경로), ...]
+    지수는 pre_2와 같은 방식으로 찾음 (대문자로 바꿔 TARGET_INDICES에 있는 첫 부분, 예: ..._ndvi_v2.tif)
+    """
+    groups = {}
+    for f in sorted(glob.glob(os.path.join(folder_path, "*.tif"))):
+        parts = os.path.splitext(os.path.basename(f))[0].split('_')
+        if len(parts) < 4 or parts[1] not in session_dates:
+            continue
+        index_name = next((p.upper() for p in parts if p.upper() in TARGET_INDICES), None)
+        if not index_name:
+            continue
+        groups.setdefault((parts[0], index_name), []).append((parts[1], f))
+    return {key: sorted(files) for key, files in groups.items()}
+
+
+def iter_tile_windows(width, height, n_sessions, n_breaks=None, n_jacobian=0):
+    """
+    메모리 예산 안에 들어오는 정사각 타일 단위로 래스터를 나눕니다.
+    - n_breaks: 곡선 조각 경계 수 (curve_breakpoint_count, 없으면 회차 수), n_jacobian: 적합 시 관측마다 쓰는 편미분 수
+    - 타일 한 변은 PHENOLOGY_TILE_SIZE의 배수, 예산이 그보다 작으면 16의 배수로 줄임
+    """
+    # 픽셀당 사용량: 조각 경계마다 float64 스플라인 계수/Peak·기울기 후보 배열(약 40배)
+    # + 관측 회차마다 관측값과 편미분(배치 LM의 정규방정식 포함 약 4배)
+    n_breaks = n_breaks or n_sessions
+    bytes_per_pixel = n_breaks * 8 * 40 + n_sessions * (1 + n_jacobian) * 8 * 4
+    side = int(math.sqrt(PHENOLOGY_MEMORY_MB * 1024 * 1024 / bytes_per_pixel))
+    if side >= PHENOLOGY_TILE_SIZE:
+        side = side // PHENOLOGY_TILE_SIZE * PHENOLOGY_TILE_SIZE
+    else:
+        side = max(16, side // 16 * 16)
+
+    for row_off in range(0, height, side):
+        for col_off in range(0, width, side):
+            yield Window(col_off, row_off, min(side, width - col_off), min(side, height - row_off))
+
+
+def read_aligned_tile(tif_path, grid, window):
+    """
+    회차 래스터에서 기준 격자(grid)의 window 영역만 읽는 함수
+    - 격자(CRS/해상도/범위)가 기준과 다르면 WarpedVRT로 즉석 정렬 (Nearest, 재투영 사본 없음)
+    - 무효값(NoData, -5 미만/5 초과, 0)은 pre_2의 구역 통계와 같은 기준으로 NaN 처리
+    """
+    with rasterio.open(tif_path) as src:
+        same_grid = (src.crs == grid['crs'] and src.transform == grid['transform']
+                     and src.width == grid['width'] and src.height == grid['height'])
+        if same_grid:
+            data = src.read(1, window=window, masked=True)
+        else:
+            with WarpedVRT(src, crs=grid['crs'], transform=grid['transform'],
+                           width=grid['width'], height=grid['height'], resampling=Resampling.nearest,
+                           tolerance=WARP_TOLERANCE) as vrt:
+                data = vrt.read(1, window=window, masked=True)
+
+    data = data.astype('float64').filled(np.nan)
+    data[(data < -5) | (data > 5) | (data == 0)] = np.nan
+    return data
+
+
+def phenology_tile(tif_paths, x_values, grid, window, x_start, x_end):
+    """한 타일의 모든 픽셀에 스플라인을 맞춰 PHENOLOGY_LAYERS를 계산하는 함수 (프로세스 풀에서 호출됨)"""
+    stack = np.stack([read_aligned_tile(path, grid, window) for path in tif_paths], axis=-1)
+    y_matrix = stack.reshape(-1, len(tif_paths))  # (픽셀 수, 회차 수)
+
+    layers = np.full((len(PHENOLOGY_LAYERS), y_matrix.shape[0]), np.nan, dtype='float32')
+    for rows, cs in iter_curve_groups(x_values, y_matrix, x_start, x_end):
+        peak_values, peak_doys = spline_peaks(cs, x_start, x_end)
+        layers[0, rows] = peak_doys
+        layers[1, rows] = peak_values
+        # 생육 속도: 분석 시작일 ~ Peak 사이 곡선의 최대 기울기 (지수/일)
+        layers[2, rows] = spline_max_slope(cs, x_start, peak_doys)
+
+    return window, layers.reshape(len(PHENOLOGY_LAYERS), int(window.height), int(window.width))
+
+
+def step3_pixel_phenology_maps(tif_folder=TIF_FOLDER, output_dir=PHENOLOGY_OUTPUT_DIR,
+                               num_workers=PHENOLOGY_WORKERS, executor=None):
+    """
+    필지·지수별로 회차 래스터를 쌓아, 픽셀마다 Peak DOY / Peak 값 / 생육 속도를 GeoTIFF(밴드 3개)로 저장
+    - 기준 격자는 첫 회차 래스터, 나머지 회차는 타일을 읽을 때 기준 격자에 맞춰 정렬
+    - 타일 단위로 나누어 프로세스 풀에서 계산하고, 동시에 계산 중인 타일 수를 제한하여 메모리 사용량을 고정
+    executor: 여러 지역이 함께 쓰는 프로세스 풀 (run_all_regions.py). 없으면 num_workers 만큼 새로 만듭니다.
+    """
+    print("\n🚀 [Step 3] 픽셀 단위 생육 지도 생성 시작")
+
+    SESSION_DATES = get_session_dates_from_tifs(tif_folder)
+    if not SESSION_DATES:
+        return
+
+    session_doy = {
+        sess: datetime.strptime(date_str, "%Y-%m-%d").timetuple().tm_yday
+        for sess, date_str in SESSION_DATES.items()
+    }
+    start_doy = min(session_doy.values())
+    end_doy = max(session_doy.values())
+
+    groups = {
+        key: files for key, files in group_session_rasters(tif_folder, SESSION_DATES).items()
+        if len(files) >= 3
+    }
+    if not groups:
+        print("❌ 오류: 회차가 3개 이상인 필지·지수 조합이 없습니다.")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📊 {len(groups)}개 필지·지수 조합 (분석 기간: DOY {start_doy} ~ {end_doy})")
+
+    # 출력 파일은 첫 타일을 계산하기 전에 열고, 모든 타일을 쓰면 닫음
+    open_outputs = {}
+    remaining = {}
+
+    def open_output(output_path, grid, n_tiles):
+        profile = {
+            'driver': 'GTiff', 'dtype': 'float32', 'count': len(PHENOLOGY_LAYERS), 'nodata': np.nan,
+            'crs': grid['crs'], 'transform': grid['transform'],
+            'width': grid['width'], 'height': grid['height'],
+            'tiled': True, 'blockxsize': 256, 'blockysize': 256, 'compress': 'DEFLATE',
+        }
+        dst = rasterio.open(output_path, 'w', **profile)
+        for band, name in enumerate(PHENOLOGY_LAYERS, start=1):
+            dst.set_band_description(band, name)
+        open_outputs[output_path] = dst
+        remaining[output_path] = n_tiles
+
+    def iter_tasks():
+        """필지·지수 순서대로 출력 파일을 열고, (출력 파일, 타일 계산 인자)를 생성"""
+        for (field, index_name), files in sorted(groups.items()):
+            tif_paths = [path for _, path in files]
+            x_values = np.array([session_doy[sess] for sess, _ in files])
+            with rasterio.open(tif_paths[0]) as ref:
+                grid = {'crs': ref.crs, 'transform': ref.transform, 'width': ref.width, 'height': ref.height}
+            output_path = os.path.join(output_dir, f"{field}_{index_name}_phenology.tif")
+            n_breaks = curve_breakpoint_count(len(tif_paths), start_doy, end_doy)
+            n_jacobian = 6 if CURVE_MODEL == 'double_logistic' else 0
+            windows = list(iter_tile_windows(grid['width'], grid['height'], len(tif_paths), n_breaks, n_jacobian))
+            open_output(output_path, grid, len(windows))
+            for window in windows:
+                yield output_path, (tif_paths, x_values, grid, window, start_doy, end_doy)
+
+    def write_tile(output_path, result):
+        window, layers = result
+        open_outputs[output_path].write(layers, window=window)
+        remaining[output_path] -= 1
+        if remaining[output_path] == 0:
+            open_outputs.pop(output_path).close()
+            print(f"   [저장] {os.path.basename(output_path)}")
+
+    def run_on(pool, max_in_flight):
+        in_flight = {}
+        for output_path, args in iter_tasks():
+            in_flight[pool.submit(phenology_tile, *args)] = output_path
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_tile(in_flight.pop(future), future.result())
+        for future in list(in_flight):
+            write_tile(in_flight.pop(future), future.result())
+
+    try:
+        if executor is not None:
+            run_on(executor, max(1, num_workers) * 2)
+        elif num_workers <= 1:
+            for output_path, args in iter_tasks():
+                write_tile(output_path, phenology_tile(*args))
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as own_executor:
+                run_on(own_executor, num_workers * 2)
+    finally:
+        for dst in open_outputs.values():
+            dst.close()
+
+    print(f"\n💾 [완료] 생육 지도 저장됨: {output_dir} (밴드: {', '.join(PHENOLOGY_LAYERS)})")
 
 
 if __name__ == "__main__":
-    step2_auto_interpolation_final()
\ No newline at end of file
+    step2_auto_interpolation_final()
+    if PHENOLOGY_MAPS:
+        step3_pixel_phenology_maps()
\ No newline at end of file
@@ -0,0 +1,204 @@
+import os
+import sys
+import importlib.util
+import numpy as np
+import pandas as pd
+from scipy.interpolate import PPoly
+from datetime import datetime, timedelta
+
+# ==========================================
+# [설정] 입력/출력 경로
+# ==========================================
+# 1. pre_3에서 저장한 곡선 계수 (SAVE_CURVE_COEFFICIENTS)
+COEF_FILE = 'output/hs_curve_coefficients.npz'
+
+# 2. 특징을 붙일 pre_3 결과 (sample_code 기준으로 결합, 없으면 특징만 저장)
+INPUT_FILE = 'output/hs_time_series_weekly_auto.csv'
+
+# 3. 결과 저장 경로 (theme 스크립트의 INPUT_FILE로 바로 사용 가능)
+OUTPUT_FILE = 'output/hs_curve_features.csv'
+
+# 생육 시작/종료일 기준: 시작(종료)값과 Peak 값 사이의 비율 (0.5 = 진폭의 50% 지점을 지나는 날)
+THRESHOLD_FRACTION = 0.5
+# ==========================================
+
+# 지수별로 만드는 특징 컬럼 ({지수}_{특징})
+FEATURE_NAMES = ['AUC', 'Greenup_Rate', 'Senescence_Rate', 'Greenup_DOY', 'Senescence_DOY', 'Season_Length']
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_stage(filename, module_name):
+    """파일명에 '.'이 들어간 단계 스크립트를 모듈로 불러옵니다. (run_all_regions.py가 이미 불러왔으면 그대로 사용)"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Peak/최대 기울기 계산은 pre_3의 배치 CubicSpline 함수(spline_peaks, spline_max_slope)를 그대로 사용
+pre_3 = load_stage('pre_3.interpolation.py', 'pre_3_interpolation')
+
+
+# ------------------------------------------
+# 조각별 3차식 계산 (모든 포인트를 한꺼번에)
+#   breaks: (경계 수,) 조각 경계, c: (4, 조각 수, 포인트 수) 계수
+#   조각 i: c0*t^3 + c1*t^2 + c2*t + c3 (t = x - breaks[i]), 첫/마지막 조각은 경계 밖으로 외삽
+# ------------------------------------------
+def piece_ranges(breaks, lo, hi):
+    """조각마다 담당 구간을 포인트별 [lo, hi]로 자른 (시작, 끝) 배열 (조각 수, 포인트 수)"""
+    inner = breaks[1:-1]
+    start = np.maximum(np.concatenate([[-np.inf], inner])[:, None], lo[None, :])
+    end = np.minimum(np.concatenate([inner, [np.inf]])[:, None], hi[None, :])
+    return start, end
+
+
+def cubic_real_roots(a, b, c, d):
+    """
+    a*t^3 + b*t^2 + c*t + d = 0 의 실근을 원소별로 동시에 구하는 함수 (동반 행렬의 고유값)
+    - 반환: 입력 모양 + (3,), 실근이 없는 자리는 NaN. a가 0이면 2차식(또는 1차식)으로 풀이
+    """
+    shape = np.shape(a)
+    a, b, c, d = (np.ravel(v).astype(float) for v in (a, b, c, d))
+    roots = np.full((a.size, 3), np.nan)
+
+    cubic = np.abs(a) > 1e-15 * (np.abs(b) + np.abs(c) + np.abs(d))
+    if cubic.any():
+        companion = np.zeros((int(cubic.sum()), 3, 3))
+        companion[:, 0, 0] = -b[cubic] / a[cubic]
+        companion[:, 0, 1] = -c[cubic] / a[cubic]
+        companion[:, 0, 2] = -d[cubic] / a[cubic]
+        companion[:, 1, 0] = 1
+        companion[:, 2, 1] = 1
+        eig = np.linalg.eigvals(companion)
+        is_real = np.abs(eig.imag) <= 1e-9 * (1 + np.abs(eig.real))
+        roots[cubic] = np.where(is_real, eig.real, np.nan)
+
+    quadratic = ~cubic
+    if quadratic.any():
+        qa, qb, qc = b[quadratic], c[quadratic], d[quadratic]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            disc = qb * qb - 4 * qa * qc
+            q = -0.5 * (qb + np.where(qb >= 0, 1.0, -1.0) * np.sqrt(np.where(disc >= 0, disc, np.nan)))
+            roots[quadratic, 0] = q / qa
+            roots[quadratic, 1] = qc / q
+
+    return roots.reshape(shape + (3,))
+
+
+def curve_integral(breaks, c, lo, hi):
+    """[lo, hi] 구간 적분 (AUC, 지수·일): 조각별 4차 부정적분의 차를 합산"""
+    start, end = piece_ranges(breaks, lo, hi)
+    origin = breaks[:-1][:, None]
+
+    def antiderivative(t):
+        return (((c[0] / 4 * t + c[1] / 3) * t + c[2] / 2) * t + c[3]) * t
+
+    valid = end > start
+    t_start = np.where(valid, start - origin, 0.0)
+    t_end = np.where(valid, end - origin, 0.0)
+    return (antiderivative(t_end) - antiderivative(t_start)).sum(axis=0)
+
+
+def first_crossing(breaks, c, level, lo, hi):
+    """[lo, hi] 구간에서 곡선이 level (포인트 수,)을 처음 지나는 위치. 없으면 NaN"""
+    start, end = piece_ranges(breaks, lo, hi)
+    roots = cubic_real_roots(c[0], c[1], c[2], c[3] - level[None, :])  # (조각 수, 포인트 수, 3)
+    root_x = breaks[:-1][:, None, None] + roots
+    inside = np.isfinite(root_x) & (root_x >= start[..., None]) & (root_x <= end[..., None])
+    root_x = np.where(inside, root_x, np.inf).min(axis=(0, 2))
+    return np.where(np.isfinite(root_x), root_x, np.nan)
+
+
+def compute_curve_features(breaks, coefs, x_start, x_end):
+    """
+    포인트별 곡선 계수에서 특징을 계산하는 함수 (재적합 없음)
+    - breaks: (포인트 수, 최대 경계 수), coefs: (포인트 수, 4, 최대 경계 수 - 1), 뒤쪽 NaN은 빈 자리
+    - 조각 경계가 같은 포인트끼리 묶어 배열 연산으로 한꺼번에 계산
+    - 반환: {특징 이름: (포인트 수,) 배열}, 곡선이 없는 포인트는 NaN
+    """
+    n_points = breaks.shape[0]
+    features = {name: np.full(n_points, np.nan) for name in FEATURE_NAMES}
+
+    patterns, group_ids = np.unique(np.nan_to_num(breaks, nan=-np.inf), axis=0, return_inverse=True)
+    group_ids = group_ids.reshape(-1)
+    for group_id, pattern in enumerate(patterns):
+        group_breaks = pattern[np.isfinite(pattern)]
+        if len(group_breaks) < 2:
+            continue
+        rows = np.flatnonzero(group_ids == group_id)
+        # pre_3의 배치 CubicSpline(axis=1)과 같은 형태: cs.c = (4, 조각 수, 포인트 수)
+        cs = PPoly(coefs[rows][:, :, :len(group_breaks) - 1], group_breaks, axis=1)
+        c = cs.c
+        lo = np.full(len(rows), float(x_start))
+        hi = np.full(len(rows), float(x_end))
+
+        peak_values, peak_doys = pre_3.spline_peaks(cs, x_start, x_end)
+        start_values, end_values = cs([x_start, x_end]).T
+
+        features['AUC'][rows] = curve_integral(group_breaks, c, lo, hi)
+        features['Greenup_Rate'][rows] = pre_3.spline_max_slope(cs, lo, peak_doys)
+        features['Senescence_Rate'][rows] = -pre_3.spline_max_slope(cs, peak_doys, hi, sign=-1)
+
+        # 생육 시작일: 시작값→Peak 진폭의 THRESHOLD_FRACTION 지점을 처음 지나는 날 (Peak 이전)
+        greenup_level = start_values + THRESHOLD_FRACTION * (peak_values - start_values)
+        features['Greenup_DOY'][rows] = first_crossing(group_breaks, c, greenup_level, lo, peak_doys)
+        # 생육 종료일: Peak 이후 종료값 쪽 진폭의 THRESHOLD_FRACTION 지점까지 처음 내려오는 날
+        senescence_level = end_values + THRESHOLD_FRACTION * (peak_values - end_values)
+        features['Senescence_DOY'][rows] = first_crossing(group_breaks, c, senescence_level, peak_doys, hi)
+
+    features['Season_Length'] = features['Senescence_DOY'] - features['Greenup_DOY']
+    return features
+
+
+def doy_to_date_str(base_year, doy):
+    """DOY(소수 가능)를 가장 가까운 날짜의 MM-DD 문자열로 변환 (NaN이면 NaN)"""
+    if np.isnan(doy):
+        return np.nan
+    return (datetime(base_year, 1, 1) + timedelta(days=int(np.floor(doy + 0.5)) - 1)).strftime("%m-%d")
+
+
+def step4_curve_features(coef_file=COEF_FILE, input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    print("\n🚀 [Step 4] 곡선 계수 기반 생육 특징 계산 시작")
+
+    if not os.path.exists(coef_file):
+        print(f"❌ 오류: 곡선 계수 파일({coef_file})이 없습니다. pre_3의 SAVE_CURVE_COEFFICIENTS를 확인해주세요.")
+        return
+
+    store = np.load(coef_file)
+    base_year = int(store['base_year'])
+    start_doy, end_doy = float(store['start_doy']), float(store['end_doy'])
+    index_names = [key[:-len('_breaks')] for key in store.files if key.endswith('_breaks')]
+    print(f"📄 곡선 계수 로드: {len(store['sample_code'])}개 포인트, 지수 {index_names} "
+          f"(모델: {store['curve_model']}, 기간: DOY {start_doy:.0f} ~ {end_doy:.0f})")
+
+    df_features = pd.DataFrame({'sample_code': store['sample_code']})
+    for index_name in index_names:
+        features = compute_curve_features(store[f'{index_name}_breaks'], store[f'{index_name}_coefs'],
+                                          start_doy, end_doy)
+        for name in FEATURE_NAMES:
+            df_features[f'{index_name}_{name}'] = features[name]
+        df_features[f'{index_name}_Greenup_Date'] = [doy_to_date_str(base_year, d) for d in features['Greenup_DOY']]
+        df_features[f'{index_name}_Senescence_Date'] = [doy_to_date_str(base_year, d)
+                                                        for d in features['Senescence_DOY']]
+        print(f"   ✅ {index_name}: {int(np.isfinite(features['AUC']).sum())} / {len(df_features)} 건")
+
+    # pre_3 결과에 특징 컬럼을 붙여 저장 (sample_code 기준)
+    if input_file and os.path.exists(input_file):
+        df = pd.read_csv(input_file)
+        if 'sample_code' in df.columns:
+            df['sample_code'] = df['sample_code'].astype(str)
+            df_features = df.merge(df_features, on='sample_code', how='left')
+        elif len(df) == len(df_features):
+            df_features = pd.concat([df, df_features.drop(columns='sample_code')], axis=1)
+
+    df_features.to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"\n💾 [완료] 결과 저장됨: {output_file}")
+    print(f"   -> 지수별 {', '.join(FEATURE_NAMES)}, Greenup/Senescence_Date 컬럼이 추가되었습니다.")
+
+
+if __name__ == "__main__":
+    step4_curve_features()
@@ -0,0 +1,157 @@
+"""
+[전처리 일괄 실행] 여러 지역의 pre_1 → pre_2 → pre_3 → pre_4 단계를 한 번에 실행
+
+목적: 지역마다 스크립트 상단 경로를 고쳐 가며 하나씩 돌리던 전처리를, 지역 설정 하나로 동시에 실행
+
+동작 방식:
+- 지역마다 스레드 하나가 단계를 순서대로 진행 (지역 간에는 동시에 진행)
+- 실제 계산(파일별 재투영, 필지·회차별 구역 통계, 보간)은 모든 지역이 함께 쓰는 프로세스 풀 하나에서 실행
+- 작업이 풀 하나에 섞여 들어가므로, 작은 지역이 먼저 끝나면 남은 코어가 큰 지역 작업을 이어받음
+
+사용법: scripts 폴더에서 `python run_all_regions.py`
+"""
+
+import os
+import sys
+import json
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# ==========================================
+# [설정] 지역별 경로 (REGION_CONFIG_FILE이 있으면 그 파일의 내용을 대신 사용)
+# ==========================================
+REGION_CONFIG_FILE = 'regions.json'
+
+REGIONS = {
+    '화성': {
+        'prefix': 'hs',  # 결과 파일 접두어 (hs_final_matched.csv, hs_time_series_weekly_auto.csv ...)
+        'tif_folder': '../data/생육데이터/화성',
+        'geojson_folder': '../geo_data/화성',
+        'reprojected_folder': '../data/생육데이터/화성/hs_data_reprojected_5179',
+    },
+    '김제': {
+        'prefix': 'gj',
+        'tif_folder': '../data/생육데이터/김제',
+        'geojson_folder': '../geo_data/김제',
+        'reprojected_folder': '../data/생육데이터/김제/gj_data_reprojected_5179',
+    },
+    # 구례/순창 GeoJSON은 sample_code 대신 필지 단위 code 컬럼을 사용하므로,
+    # pre_2의 SAMPLE_CODE_COLUMN/PARCEL_ID_PATTERN을 확인한 뒤 추가하세요.
+    # '구례': {'prefix': 'gr', 'tif_folder': '../data/생육데이터/구례', 'geojson_folder': '../geo_data/구례',
+    #          'reprojected_folder': '../data/생육데이터/구례/gr_data_reprojected_5179'},
+    # '순창': {'prefix': 'sc', 'tif_folder': '../data/생육데이터/순창', 'geojson_folder': '../geo_data/순창',
+    #          'reprojected_folder': '../data/생육데이터/순창/sc_data_reprojected_5179'},
+}
+
+# 실행할 단계 ('pre_1'은 재투영 사본이 필요할 때만. pre_2의 VIRTUAL_REPROJECTION을 쓰면 생략 가능)
+# 'pre_4'는 pre_3이 저장한 곡선 계수로 AUC/기울기/생육 시작·종료일 계산 (재적합 없음)
+# 'phenology'를 추가하면 pre_3의 픽셀 단위 생육 지도(Peak DOY/Peak 값/생육 속도)도 생성
+STAGES = ['pre_2', 'pre_3', 'pre_4']
+
+OUTPUT_FOLDER = 'output'
+NUM_WORKERS = os.cpu_count() or 1  # 모든 지역이 함께 쓰는 프로세스 수
+# ==========================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_stage(filename, module_name):
+    """파일명에 '.'이 들어간 단계 스크립트(pre_1.reproject_rasters.py 등)를 모듈로 불러옵니다."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# 모듈 최상단에서 불러와야, 프로세스 풀의 자식 프로세스(Windows spawn)도 같은 이름으로 단계 함수를 찾을 수 있음
+pre_1 = load_stage('pre_1.reproject_rasters.py', 'pre_1_reproject_rasters')
+pre_2 = load_stage('pre_2.zonal_statistics.py', 'pre_2_zonal_statistics')
+pre_3 = load_stage('pre_3.interpolation.py', 'pre_3_interpolation')
+pre_4 = load_stage('pre_4.curve_features.py', 'pre_4_curve_features')
+
+
+def load_regions():
+    """REGION_CONFIG_FILE(JSON)이 있으면 읽고, 없으면 스크립트의 REGIONS를 사용합니다."""
+    if REGION_CONFIG_FILE and os.path.exists(REGION_CONFIG_FILE):
+        with open(REGION_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            regions = json.load(f)
+        print(f"📄 지역 설정 로드: {REGION_CONFIG_FILE}")
+        return regions
+    return REGIONS
+
+
+def run_region(region_name, config, executor):
+    """한 지역의 단계를 순서대로 실행합니다. 계산은 공유 프로세스 풀(executor)에 맡깁니다."""
+    prefix = config['prefix']
+    matched_file = os.path.join(OUTPUT_FOLDER, f'{prefix}_final_matched.csv')
+    detail_file = os.path.join(OUTPUT_FOLDER, f'{prefix}_final_matched_stats.csv')
+    time_series_file = os.path.join(OUTPUT_FOLDER, f'{prefix}_time_series_weekly_auto.csv')
+    curve_img_dir = os.path.join(OUTPUT_FOLDER, f'{prefix}_growth_curves_weekly')
+    daily_series_file = os.path.join(OUTPUT_FOLDER, f'{prefix}_time_series_daily.csv')
+    coef_file = os.path.join(OUTPUT_FOLDER, f'{prefix}_curve_coefficients.npz')
+    features_file = os.path.join(OUTPUT_FOLDER, f'{prefix}_curve_features.csv')
+    phenology_dir = os.path.join(OUTPUT_FOLDER, f'{prefix}_phenology_maps')
+
+    if 'pre_1' in STAGES:
+        print(f"\n[{region_name}] pre_1 좌표계 변환")
+        pre_1.main(config['tif_folder'], config['reprojected_folder'], executor=executor)
+
+    if 'pre_2' in STAGES:
+        print(f"\n[{region_name}] pre_2 구역 통계")
+        pre_2.step1_smart_matching_stats(
+            geojson_folder=config['geojson_folder'],
+            tif_folder=config.get('zonal_tif_folder', config['tif_folder']),
+            output_file=matched_file,
+            output_detail_file=detail_file,
+            executor=executor)
+
+    if 'pre_3' in STAGES:
+        print(f"\n[{region_name}] pre_3 시계열 보간")
+        # 보간은 이 스레드에서, 그래프 저장(PLOT_MODE)은 공유 프로세스 풀에서 실행
+        pre_3.step2_auto_interpolation_final(
+            matched_file, config['tif_folder'], time_series_file, curve_img_dir,
+            daily_series_file, coef_file, executor=executor)
+
+    if 'pre_4' in STAGES:
+        print(f"\n[{region_name}] pre_4 곡선 특징")
+        pre_4.step4_curve_features(coef_file, time_series_file, features_file)
+
+    if 'phenology' in STAGES:
+        print(f"\n[{region_name}] pre_3 픽셀 단위 생육 지도")
+        pre_3.step3_pixel_phenology_maps(config['tif_folder'], phenology_dir,
+                                         num_workers=NUM_WORKERS, executor=executor)
+
+    return region_name
+
+
+def main():
+    regions = load_regions()
+    if not regions:
+        print("❌ 오류: 실행할 지역이 없습니다.")
+        return
+
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    print(f"🚀 {len(regions)}개 지역 일괄 실행: {', '.join(regions)} (단계: {', '.join(STAGES)}, 프로세스 {NUM_WORKERS}개)")
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=len(regions)) as region_threads:
+        futures = {
+            region_threads.submit(run_region, name, config, executor): name
+            for name, config in regions.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                print(f"\n✅ [{name}] 완료")
+            except Exception as e:
+                failed.append(name)
+                print(f"\n❌ [{name}] 실패: {e}")
+
+    print(f"\n--- 일괄 실행 종료: 성공 {len(regions) - len(failed)}개 / 실패 {len(failed)}개 ---")
+
+
+if __name__ == '__main__':
+    main()